@@ -178,6 +178,15 @@ LOGGING = {
 FTP_HOST = os.environ.get('FTP_HOST')
 FTP_LOGIN = os.environ.get('FTP_LOGIN')
 FTP_PASSWORD = os.environ.get('FTP_PASSWORD')
+FTP_STREAMING_MODE = int(os.environ.get('FTP_STREAMING_MODE', default=1))
+FTP_TAIL_MODE = int(os.environ.get('FTP_TAIL_MODE', default=0))
+INGEST_DOWNLOAD_WORKERS = int(os.environ.get('INGEST_DOWNLOAD_WORKERS',
+                                             default=1))
+INGEST_PARSE_WORKERS = int(os.environ.get('INGEST_PARSE_WORKERS', default=1))
+INGEST_LOCK_FILE = os.environ.get(
+    'INGEST_LOCK_FILE', default=os.path.join(BASE_DIR, 'ingest.lock'))
+LOG_CACHE_DIR = os.environ.get('LOG_CACHE_DIR', default='')
+LOG_CACHE_MAX_SIZE = int(os.environ.get('LOG_CACHE_MAX_SIZE', default=2048))
 
 CAR_LOGFILE_PREFIX = 'ImmobilizerLog'
 DAYS_LIMIT = int(os.environ.get('DAYS_LIMIT'))
@@ -187,6 +196,37 @@ MINIMAL_ENEVT_COUNT_CRITERIA = int(os.environ.get(
     'MINIMAL_ENEVT_COUNT_CRITERIA'))
 MINIMAL_USED_DAYS_CRITERIA = int(os.environ.get(
     'MINIMAL_USED_DAYS_CRITERIA'))
+PHANTOM_INIT_HOURS = int(os.environ.get('PHANTOM_INIT_HOURS', default=6))
+PHANTOM_DELETION_HOURS = int(os.environ.get('PHANTOM_DELETION_HOURS',
+                                            default=3))
+DB_UPSERT_IMPORT = int(os.environ.get('DB_UPSERT_IMPORT', default=0))
+DB_INSERT_BATCH_SIZE = int(os.environ.get('DB_INSERT_BATCH_SIZE',
+                                          default=950))
+DB_UPDATE_BATCH_SIZE = int(os.environ.get('DB_UPDATE_BATCH_SIZE',
+                                          default=500))
+DB_MAX_PACKET_SIZE = int(os.environ.get('DB_MAX_PACKET_SIZE', default=0))
+STATS_RECONCILE_HOURS = int(os.environ.get('STATS_RECONCILE_HOURS',
+                                           default=24))
+EVENT_RETENTION_DAYS = int(os.environ.get('EVENT_RETENTION_DAYS', default=0))
+EVENT_RETENTION_CHUNK_SIZE = int(os.environ.get('EVENT_RETENTION_CHUNK_SIZE',
+                                                default=5000))
+EVENT_ARCHIVE_DIR = os.environ.get(
+    'EVENT_ARCHIVE_DIR', default=os.path.join(BASE_DIR, 'archive'))
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[os.environ.get('CACHE_BACKEND',
+                                                 default='locmem')],
+        'LOCATION': os.environ.get('CACHE_LOCATION', default=''),
+        'TIMEOUT': int(os.environ.get('CACHE_TIMEOUT', default=24 * 60 * 60)),
+    }
+}
 
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
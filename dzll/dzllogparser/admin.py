@@ -1,11 +1,11 @@
 from django.contrib import admin
 
-from dzllogparser.models import Car, Player, Event
+from dzllogparser.models import Car, DatasetStats, Player, Event, IngestJob
 
 
 class EventAdmin(admin.ModelAdmin):
     list_display = ('action_time', 'player', 'action', 'car')
-    search_fields = ('player', 'action', 'car')
+    search_fields = ('player', 'action__name', 'car')
     list_filter = ('action',)
 
 
@@ -14,6 +14,13 @@ class CarAdmin(admin.ModelAdmin):
     list_filter = ('car_status',)
 
 
+class IngestJobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'status', 'created_time', 'finished_time')
+    list_filter = ('status',)
+
+
 admin.site.register(Car, CarAdmin)
 admin.site.register(Player)
 admin.site.register(Event, EventAdmin)
+admin.site.register(IngestJob, IngestJobAdmin)
+admin.site.register(DatasetStats)
@@ -0,0 +1,40 @@
+import datetime
+
+from django import forms
+from django.utils import timezone
+
+
+class DateRangeForm(forms.Form):
+    date_from = forms.DateField(
+        required=False, label='From',
+        widget=forms.DateInput(attrs={'type': 'date'}))
+    date_to = forms.DateField(
+        required=False, label='To',
+        widget=forms.DateInput(attrs={'type': 'date'}))
+
+    def get_time_filters(self, time_field: str) -> dict:
+        """Returns queryset filters for time_field in selected dates,
+        both dates are included. Invalid dates are ignored.
+        """
+        if not self.is_valid():
+            return {}
+        filters = dict()
+        date_from = self.cleaned_data.get('date_from')
+        date_to = self.cleaned_data.get('date_to')
+        if date_from:
+            filters[f'{time_field}__gte'] = timezone.make_aware(
+                datetime.datetime.combine(date_from, datetime.time.min))
+        if date_to:
+            filters[f'{time_field}__lt'] = timezone.make_aware(
+                datetime.datetime.combine(
+                    date_to + datetime.timedelta(days=1), datetime.time.min))
+        return filters
+
+    def get_query(self) -> str:
+        """Returns url query with selected dates."""
+        if not self.is_valid():
+            return ''
+        return '&'.join(
+            f'{name}={value.isoformat()}'
+            for name, value in self.cleaned_data.items() if value
+        )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dzllogparser.services.db import DEDUP_CHUNK_SIZE, dedup_events
+from dzllogparser.services.ingest import IngestAlreadyRunning, ingest_lock
+
+
+class Command(BaseCommand):
+    help = 'Sets missing event hashes and deletes duplicated events.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEDUP_CHUNK_SIZE,
+            help='Number of events processed per transaction.')
+
+    def handle(self, *args, **options):
+        try:
+            with ingest_lock():
+                status = dedup_events(chunk_size=options['chunk_size'])
+        except IngestAlreadyRunning:
+            raise CommandError('Another ingest is running.')
+        self.stdout.write(self.style.SUCCESS(str(status)))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from dzllogparser.services.db import change_status_for_phantoms
+
+
+class Command(BaseCommand):
+    help = 'Marks cars not initialized for PHANTOM_INIT_HOURS as deleted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only count phantom cars.')
+
+    def handle(self, *args, **options):
+        phantoms_number = change_status_for_phantoms(
+            dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f'Phantom cars found: {phantoms_number}.')
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Phantom cars marked as deleted: {phantoms_number}.'))
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from dzllogparser.services.retention import prune_events
+
+
+class Command(BaseCommand):
+    help = 'Archives old events and deletes them from db.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.EVENT_RETENTION_DAYS,
+            help='Keep events of last DAYS days.')
+        parser.add_argument(
+            '--chunk-size', type=int,
+            default=settings.EVENT_RETENTION_CHUNK_SIZE,
+            help='Number of events deleted per query.')
+        parser.add_argument(
+            '--archive-dir', default=settings.EVENT_ARCHIVE_DIR,
+            help='Directory for monthly compressed event archives.')
+        parser.add_argument(
+            '--no-archive', action='store_true',
+            help='Delete old events without archiving.')
+
+    def handle(self, *args, **options):
+        if options['days'] <= 0:
+            raise CommandError(
+                'Retention period is not set, use --days or '
+                'EVENT_RETENTION_DAYS.')
+        status = prune_events(
+            days=options['days'], chunk_size=options['chunk_size'],
+            archive_dir=None if options['no_archive'] else
+            options['archive_dir'])
+        self.stdout.write(self.style.SUCCESS(str(status)))
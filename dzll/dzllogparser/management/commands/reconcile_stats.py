@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from dzllogparser.services.stats import reconcile_dataset_stats
+
+
+class Command(BaseCommand):
+    help = 'Recounts players, cars and events numbers shown on index page.'
+
+    def handle(self, *args, **options):
+        stats = reconcile_dataset_stats()
+        self.stdout.write(self.style.SUCCESS(str(stats)))
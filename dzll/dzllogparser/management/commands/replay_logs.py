@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from dzllogparser.services.ingest import IngestAlreadyRunning, ingest_lock
+from dzllogparser.services.logsource import (ReplayProgress, get_log_source,
+                                             replay_logs)
+
+
+class Command(BaseCommand):
+    help = ('Imports logfiles not imported before from local directory, '
+            'tar or zip archive or ftp server.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            help='Directory or archive with logfile directories, '
+                 'ftp server is used if omitted.')
+        parser.add_argument(
+            '--days-limit', type=int, default=0,
+            help='Delete cars deleted more than DAYS_LIMIT days ago.')
+        parser.add_argument(
+            '--parse-workers', type=int,
+            default=settings.INGEST_PARSE_WORKERS,
+            help='Number of logfile parsing processes.')
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Import already imported directories too to rebuild db, '
+                 'cars and players get state of the replayed logfiles.')
+
+    def handle(self, *args, **options):
+        try:
+            source = get_log_source(options['path'])
+        except (OSError, ValueError) as exception:
+            raise CommandError(exception)
+        try:
+            with ingest_lock(), source:
+                result = replay_logs(
+                    source, days_limit=options['days_limit'],
+                    parse_workers=options['parse_workers'],
+                    progress_callback=self.write_progress,
+                    force=options['force'])
+        except IngestAlreadyRunning:
+            raise CommandError('Another ingest is running.')
+        self.stdout.write(self.style.SUCCESS(str(result)))
+
+    def write_progress(self, progress: ReplayProgress) -> None:
+        elapsed_time = max(progress.elapsed_time, 0.001)
+        megabytes_read = progress.bytes_read / 1024 / 1024
+        self.stdout.write(
+            f'[{progress.directories_done}/{progress.directories_total}] '
+            f'{progress.dir_name}: {megabytes_read:.1f} MB, '
+            f'{megabytes_read / elapsed_time:.2f} MB/s, '
+            f'{progress.events_created / elapsed_time:.0f} events/s')
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from dzllogparser.models import IngestJob
+from dzllogparser.services.ingest import create_ingest_job, run_ingest_job
+
+
+class Command(BaseCommand):
+    help = 'Imports new logfiles from ftp server into db.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Repeat ingest every INTERVAL minutes.')
+
+    def handle(self, *args, **options):
+        while True:
+            self.run_once()
+            if not options['interval']:
+                break
+            time.sleep(options['interval'] * 60)
+
+    def run_once(self) -> None:
+        job = create_ingest_job()
+        if job is None:
+            self.stderr.write('Another ingest is running, skipped.')
+            return
+        job = run_ingest_job(job.pk)
+        if job.status == IngestJob.JobStatus.DONE:
+            self.stdout.write(self.style.SUCCESS(f'{job}: {job.result}'))
+        else:
+            self.stderr.write(f'{job}: {job.error}')
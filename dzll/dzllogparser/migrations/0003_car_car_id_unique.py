@@ -0,0 +1,38 @@
+# Generated by Django 4.1.7 on 2026-10-18 11:55
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def forwards_func(apps, schema_editor):
+    """Merges duplicate car records into the latest one
+    before car_id becomes unique.
+    """
+    Car = apps.get_model('dzllogparser', 'Car')
+    Event = apps.get_model('dzllogparser', 'Event')
+    duplicates = Car.objects.values('car_id').annotate(
+        records_count=Count('id'), last_pk=Max('id')).filter(
+            records_count__gt=1)
+    for duplicate in duplicates:
+        old_records = Car.objects.filter(
+            car_id=duplicate['car_id']).exclude(pk=duplicate['last_pk'])
+        Event.objects.filter(car__in=old_records).update(
+            car_id=duplicate['last_pk'])
+        old_records.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzllogparser', '0002_car_last_using_time'),
+    ]
+
+    operations = [
+        migrations.RunPython(code=forwards_func,
+                             reverse_code=migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='car',
+            name='car_id',
+            field=models.CharField(db_index=True, max_length=255, unique=True, verbose_name='Server CarID'),
+        ),
+    ]
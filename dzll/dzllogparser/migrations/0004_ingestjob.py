@@ -0,0 +1,27 @@
+# Generated by Django 4.1.7 on 2026-10-18 11:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzllogparser', '0003_car_car_id_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='QUEUED', max_length=10, verbose_name='Job status')),
+                ('created_time', models.DateTimeField(auto_now_add=True, verbose_name='Created time')),
+                ('started_time', models.DateTimeField(blank=True, null=True, verbose_name='Started time')),
+                ('finished_time', models.DateTimeField(blank=True, null=True, verbose_name='Finished time')),
+                ('directories_total', models.PositiveIntegerField(default=0, verbose_name='Directories to process')),
+                ('directories_done', models.PositiveIntegerField(default=0, verbose_name='Processed directories')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Records status')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1.7 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzllogparser', '0004_ingestjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('directory', models.CharField(max_length=32, unique=True, verbose_name='Directory')),
+                ('byte_offset', models.PositiveBigIntegerField(default=0, verbose_name='Imported bytes')),
+                ('status', models.CharField(choices=[('DONE', 'Done'), ('FAILED', 'Failed')], default='DONE', max_length=10, verbose_name='Checkpoint status')),
+                ('updated_time', models.DateTimeField(auto_now=True, verbose_name='Updated time')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 12:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzllogparser', '0005_ingestcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ingestcheckpoint',
+            name='status',
+            field=models.CharField(choices=[('PARTIAL', 'Partial'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='DONE', max_length=10, verbose_name='Checkpoint status'),
+        ),
+    ]
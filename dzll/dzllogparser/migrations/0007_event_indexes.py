@@ -0,0 +1,29 @@
+# Generated by Django 4.1.7 on 2026-10-18 12:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzllogparser', '0006_ingestcheckpoint_partial_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['player', 'action_time'], name='event_player_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['car', 'action_time'], name='event_car_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['action', 'action_time'], name='event_action_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['action_time'], name='event_time_idx'),
+        ),
+    ]
@@ -0,0 +1,140 @@
+# Generated by Django 4.1.7 on 2026-10-18 12:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Max
+
+
+EVENT_CHUNK_SIZE = 5000
+
+
+def convert_events_with_sql(schema_editor, Event, Action, last_pk):
+    """Sets event action references and splits positions into
+    coordinates with MySQL string functions, in primary key ranges."""
+    table = Event._meta.db_table
+    action_table = Action._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        for start_pk in range(0, last_pk + 1, EVENT_CHUNK_SIZE):
+            cursor.execute(
+                f'UPDATE {table} AS e '
+                f'JOIN {action_table} AS a ON a.name = e.action SET '
+                f'e.action_ref_id = a.id, '
+                f"e.position_x = CAST(SUBSTRING_INDEX(e.position, ', ', 1) "
+                f'AS DOUBLE), '
+                f"e.position_y = CAST(SUBSTRING_INDEX(SUBSTRING_INDEX("
+                f"e.position, ', ', 2), ', ', -1) AS DOUBLE), "
+                f"e.position_z = CAST(SUBSTRING_INDEX(e.position, ', ', -1) "
+                f'AS DOUBLE) '
+                f'WHERE e.id >= %s AND e.id < %s',
+                [start_pk, start_pk + EVENT_CHUNK_SIZE]
+            )
+
+
+def convert_events_with_orm(Event, action_pk_map, last_pk):
+    """Sets event action references and splits positions into
+    coordinates in python, in primary key ranges."""
+    for start_pk in range(0, last_pk + 1, EVENT_CHUNK_SIZE):
+        events = list(Event.objects.filter(
+            pk__gte=start_pk, pk__lt=start_pk + EVENT_CHUNK_SIZE).only(
+                'pk', 'action', 'position'))
+        for event in events:
+            event.action_ref_id = action_pk_map[event.action]
+            (event.position_x, event.position_y,
+             event.position_z) = map(float, event.position.split(', '))
+        Event.objects.bulk_update(
+            events, ['action_ref', 'position_x', 'position_y', 'position_z'],
+            batch_size=500)
+
+
+def forwards_func(apps, schema_editor):
+    Action = apps.get_model('dzllogparser', 'Action')
+    Event = apps.get_model('dzllogparser', 'Event')
+    action_names = Event.objects.values_list('action', flat=True).distinct()
+    Action.objects.bulk_create(
+        [Action(name=action_name) for action_name in action_names])
+    last_pk = Event.objects.aggregate(Max('pk'))['pk__max'] or 0
+    if schema_editor.connection.vendor == 'mysql':
+        convert_events_with_sql(schema_editor, Event, Action, last_pk)
+    else:
+        convert_events_with_orm(
+            Event, dict(Action.objects.values_list('name', 'pk')), last_pk)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzllogparser', '0007_event_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Action',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Action')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='action_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='dzllogparser.action', verbose_name='Action'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='position_x',
+            field=models.FloatField(null=True, verbose_name='X coordinate'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='position_y',
+            field=models.FloatField(null=True, verbose_name='Y coordinate'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='position_z',
+            field=models.FloatField(null=True, verbose_name='Z coordinate'),
+        ),
+        migrations.RunPython(code=forwards_func,
+                             reverse_code=migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='event',
+            name='event_action_time_idx',
+        ),
+        migrations.RemoveField(
+            model_name='event',
+            name='action',
+        ),
+        migrations.RemoveField(
+            model_name='event',
+            name='position',
+        ),
+        migrations.RenameField(
+            model_name='event',
+            old_name='action_ref',
+            new_name='action',
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='action',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='dzllogparser.action', verbose_name='Action'),
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='position_x',
+            field=models.FloatField(verbose_name='X coordinate'),
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='position_y',
+            field=models.FloatField(verbose_name='Y coordinate'),
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='position_z',
+            field=models.FloatField(verbose_name='Z coordinate'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['action', 'action_time'], name='event_action_time_idx'),
+        ),
+    ]
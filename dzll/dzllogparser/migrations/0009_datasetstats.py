@@ -0,0 +1,27 @@
+# Generated by Django 4.1.7 on 2026-10-18 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzllogparser', '0008_action_event_position_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatasetStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('players_count', models.PositiveBigIntegerField(default=0, verbose_name='Players number')),
+                ('cars_count', models.PositiveBigIntegerField(default=0, verbose_name='Cars number')),
+                ('events_count', models.PositiveBigIntegerField(default=0, verbose_name='Events number')),
+                ('last_action_time', models.DateTimeField(blank=True, null=True, verbose_name='Last action time')),
+                ('reconciled_time', models.DateTimeField(blank=True, null=True, verbose_name='Reconciled time')),
+            ],
+            options={
+                'verbose_name_plural': 'Dataset stats',
+            },
+        ),
+    ]
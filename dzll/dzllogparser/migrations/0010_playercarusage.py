@@ -0,0 +1,61 @@
+# Generated by Django 4.1.7 on 2026-10-18 12:28
+
+import datetime
+from collections import Counter
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+ACTION_TIMEZONE = datetime.timezone(offset=datetime.timedelta(hours=3))
+
+
+def forwards_func(apps, schema_editor):
+    """Counts player events per car and day for ownership window."""
+    Event = apps.get_model('dzllogparser', 'Event')
+    PlayerCarUsage = apps.get_model('dzllogparser', 'PlayerCarUsage')
+    start_time = datetime.datetime.now(ACTION_TIMEZONE) - datetime.timedelta(
+        days=settings.MINIMAL_USED_DAYS_CRITERIA + 1)
+    usage_counter = Counter(
+        (player_id, car_id, action_time.astimezone(ACTION_TIMEZONE).date())
+        for player_id, car_id, action_time in Event.objects.filter(
+            action_time__gte=start_time, player__isnull=False
+        ).values_list('player_id', 'car_id', 'action_time').iterator(
+            chunk_size=5000)
+    )
+    PlayerCarUsage.objects.bulk_create([
+        PlayerCarUsage(player_id=player_id, car_id=car_id, day=day,
+                       events_count=events_count)
+        for (player_id, car_id, day), events_count in usage_counter.items()
+    ], batch_size=950)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzllogparser', '0009_datasetstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerCarUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Day')),
+                ('events_count', models.PositiveIntegerField(default=0, verbose_name='Events number')),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dzllogparser.car', verbose_name='Car')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dzllogparser.player', verbose_name='Player')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='playercarusage',
+            index=models.Index(fields=['day'], name='usage_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='playercarusage',
+            constraint=models.UniqueConstraint(fields=('player', 'car', 'day'), name='usage_player_car_day_unique'),
+        ),
+        migrations.RunPython(code=forwards_func,
+                             reverse_code=migrations.RunPython.noop),
+    ]
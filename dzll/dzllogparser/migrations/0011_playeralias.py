@@ -0,0 +1,94 @@
+# Generated by Django 4.1.7 on 2026-10-18 12:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+BACKFILL_CHUNK_SIZE = 2000
+
+
+def get_trigrams(normalized_name):
+    return {
+        normalized_name[index:index + 3]
+        for index in range(len(normalized_name) - 2)
+    }
+
+
+def forwards_func(apps, schema_editor):
+    """Creates aliases from players current and alternate names."""
+    Player = apps.get_model('dzllogparser', 'Player')
+    PlayerAlias = apps.get_model('dzllogparser', 'PlayerAlias')
+    AliasTrigram = apps.get_model('dzllogparser', 'AliasTrigram')
+    aliases = []
+    for player_id, dayzname, dayz_alt_names in Player.objects.values_list(
+            'pk', 'dayzname', 'dayz_alt_names').iterator(
+                chunk_size=BACKFILL_CHUNK_SIZE):
+        names = {dayzname}
+        if dayz_alt_names:
+            names.update(dayz_alt_names.split(', '))
+        aliases.extend(
+            PlayerAlias(player_id=player_id, name=name,
+                        normalized_name=name.strip().casefold())
+            for name in names
+        )
+        if len(aliases) >= BACKFILL_CHUNK_SIZE:
+            PlayerAlias.objects.bulk_create(aliases, batch_size=500,
+                                            ignore_conflicts=True)
+            aliases = []
+    PlayerAlias.objects.bulk_create(aliases, batch_size=500,
+                                    ignore_conflicts=True)
+    trigrams = []
+    for alias_id, normalized_name in PlayerAlias.objects.values_list(
+            'pk', 'normalized_name').iterator(chunk_size=BACKFILL_CHUNK_SIZE):
+        trigrams.extend(
+            AliasTrigram(alias_id=alias_id, trigram=trigram)
+            for trigram in get_trigrams(normalized_name)
+        )
+        if len(trigrams) >= BACKFILL_CHUNK_SIZE:
+            AliasTrigram.objects.bulk_create(trigrams, batch_size=950,
+                                             ignore_conflicts=True)
+            trigrams = []
+    AliasTrigram.objects.bulk_create(trigrams, batch_size=950,
+                                     ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzllogparser', '0010_playercarusage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='DayZ nickname')),
+                ('normalized_name', models.CharField(db_index=True, max_length=255, verbose_name='Normalized nickname')),
+                ('first_seen_time', models.DateTimeField(blank=True, null=True, verbose_name='First seen')),
+                ('last_seen_time', models.DateTimeField(blank=True, null=True, verbose_name='Last seen')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='dzllogparser.player', verbose_name='Player')),
+            ],
+            options={
+                'verbose_name_plural': 'Player aliases',
+            },
+        ),
+        migrations.CreateModel(
+            name='AliasTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3, verbose_name='Trigram')),
+                ('alias', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dzllogparser.playeralias', verbose_name='Alias')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='playeralias',
+            constraint=models.UniqueConstraint(fields=('player', 'name'), name='alias_player_name_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='aliastrigram',
+            constraint=models.UniqueConstraint(fields=('trigram', 'alias'), name='trigram_alias_unique'),
+        ),
+        migrations.RunPython(code=forwards_func,
+                             reverse_code=migrations.RunPython.noop),
+    ]
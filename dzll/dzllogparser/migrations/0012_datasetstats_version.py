@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 12:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzllogparser', '0011_playeralias'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datasetstats',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Dataset version'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 12:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzllogparser', '0012_datasetstats_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='event_hash',
+            field=models.CharField(editable=False, max_length=32, null=True, unique=True, verbose_name='Event hash'),
+        ),
+    ]
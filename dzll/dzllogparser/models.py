@@ -17,6 +17,44 @@ class Player(models.Model):
         return f'{self.dayzname} ({self.steam_id})'
 
 
+class PlayerAlias(models.Model):
+    player = models.ForeignKey(Player, on_delete=models.CASCADE,
+                               verbose_name='Player',
+                               related_name='aliases')
+    name = models.CharField(max_length=255, verbose_name='DayZ nickname')
+    normalized_name = models.CharField(max_length=255, db_index=True,
+                                       verbose_name='Normalized nickname')
+    first_seen_time = models.DateTimeField(verbose_name='First seen',
+                                           blank=True, null=True)
+    last_seen_time = models.DateTimeField(verbose_name='Last seen',
+                                          blank=True, null=True)
+
+    class Meta:
+        verbose_name_plural = 'Player aliases'
+        constraints = [
+            models.UniqueConstraint(fields=['player', 'name'],
+                                    name='alias_player_name_unique'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.name} ({self.player.steam_id})'
+
+
+class AliasTrigram(models.Model):
+    alias = models.ForeignKey(PlayerAlias, on_delete=models.CASCADE,
+                              verbose_name='Alias')
+    trigram = models.CharField(max_length=3, verbose_name='Trigram')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['trigram', 'alias'],
+                                    name='trigram_alias_unique'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.trigram} {self.alias_id}'
+
+
 class Car(models.Model):
     class CarStatus(models.TextChoices):
         LINKED = 'LINKED', 'Linked'
@@ -24,7 +62,7 @@ class Car(models.Model):
         DELETED = 'DELETED', 'Deleted'
 
     car_id = models.CharField(max_length=255, verbose_name='Server CarID',
-                              db_index=True)
+                              db_index=True, unique=True)
     name = models.CharField(max_length=255, verbose_name='Car name')
     car_type = models.CharField(max_length=255, verbose_name='Car type')
     position = models.CharField(max_length=255, verbose_name='Coordinates')
@@ -47,14 +85,142 @@ class Car(models.Model):
         return f'{self.name} ({self.car_id})'
 
 
+class Action(models.Model):
+    name = models.CharField(max_length=255, verbose_name='Action',
+                            unique=True)
+
+    def __str__(self) -> str:
+        return self.name
+
+
 class Event(models.Model):
     action_time = models.DateTimeField(verbose_name='Action time')
     player = models.ForeignKey(Player, on_delete=models.CASCADE,
                               verbose_name='Player', blank=True, null=True)
     car = models.ForeignKey(Car, on_delete=models.CASCADE, verbose_name='Car')
-    action = models.CharField(max_length=255, verbose_name='Action')
-    position = models.CharField(max_length=255,
-                                           verbose_name='Coordinates')
+    action = models.ForeignKey(Action, on_delete=models.PROTECT,
+                               verbose_name='Action')
+    position_x = models.FloatField(verbose_name='X coordinate')
+    position_y = models.FloatField(verbose_name='Y coordinate')
+    position_z = models.FloatField(verbose_name='Z coordinate')
+    event_hash = models.CharField(max_length=32, unique=True, null=True,
+                                  editable=False, verbose_name='Event hash')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['player', 'action_time'],
+                         name='event_player_time_idx'),
+            models.Index(fields=['car', 'action_time'],
+                         name='event_car_time_idx'),
+            models.Index(fields=['action', 'action_time'],
+                         name='event_action_time_idx'),
+            models.Index(fields=['action_time'], name='event_time_idx'),
+        ]
+
+    @property
+    def position(self) -> str:
+        return (f'{self.position_x:.3f}, {self.position_y:.3f}, '
+                f'{self.position_z:.3f}')
 
     def __str__(self) -> str:
         return f'{self.action_time} {self.player} {self.action}'
+
+
+class PlayerCarUsage(models.Model):
+    player = models.ForeignKey(Player, on_delete=models.CASCADE,
+                               verbose_name='Player')
+    car = models.ForeignKey(Car, on_delete=models.CASCADE, verbose_name='Car')
+    day = models.DateField(verbose_name='Day')
+    events_count = models.PositiveIntegerField(default=0,
+                                               verbose_name='Events number')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['player', 'car', 'day'],
+                                    name='usage_player_car_day_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='usage_day_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.day} {self.player} {self.car} ({self.events_count})'
+
+
+class IngestCheckpoint(models.Model):
+    class CheckpointStatus(models.TextChoices):
+        PARTIAL = 'PARTIAL', 'Partial'
+        DONE = 'DONE', 'Done'
+        FAILED = 'FAILED', 'Failed'
+
+    directory = models.CharField(max_length=32, verbose_name='Directory',
+                                 unique=True)
+    byte_offset = models.PositiveBigIntegerField(
+        default=0, verbose_name='Imported bytes')
+    status = models.CharField(
+        max_length=10, choices=CheckpointStatus.choices,
+        default=CheckpointStatus.DONE, verbose_name='Checkpoint status'
+    )
+    updated_time = models.DateTimeField(auto_now=True,
+                                        verbose_name='Updated time')
+
+    def __str__(self) -> str:
+        return f'{self.directory} {self.status} ({self.byte_offset} bytes)'
+
+
+class IngestJob(models.Model):
+    class JobStatus(models.TextChoices):
+        QUEUED = 'QUEUED', 'Queued'
+        RUNNING = 'RUNNING', 'Running'
+        DONE = 'DONE', 'Done'
+        FAILED = 'FAILED', 'Failed'
+
+    status = models.CharField(
+        max_length=10, choices=JobStatus.choices,
+        default=JobStatus.QUEUED, verbose_name='Job status'
+    )
+    created_time = models.DateTimeField(auto_now_add=True,
+                                        verbose_name='Created time')
+    started_time = models.DateTimeField(verbose_name='Started time',
+                                        blank=True, null=True)
+    finished_time = models.DateTimeField(verbose_name='Finished time',
+                                         blank=True, null=True)
+    directories_total = models.PositiveIntegerField(
+        default=0, verbose_name='Directories to process')
+    directories_done = models.PositiveIntegerField(
+        default=0, verbose_name='Processed directories')
+    result = models.JSONField(verbose_name='Records status',
+                              blank=True, null=True)
+    error = models.TextField(verbose_name='Error', blank=True)
+
+    def get_absolute_url(self):
+        return reverse_lazy('update_db_status', kwargs={'pk': self.pk})
+
+    def is_active(self) -> bool:
+        return self.status in (self.JobStatus.QUEUED,
+                               self.JobStatus.RUNNING)
+
+    def __str__(self) -> str:
+        return f'Ingest job {self.pk} ({self.status})'
+
+
+class DatasetStats(models.Model):
+    players_count = models.PositiveBigIntegerField(
+        default=0, verbose_name='Players number')
+    cars_count = models.PositiveBigIntegerField(
+        default=0, verbose_name='Cars number')
+    events_count = models.PositiveBigIntegerField(
+        default=0, verbose_name='Events number')
+    last_action_time = models.DateTimeField(verbose_name='Last action time',
+                                            blank=True, null=True)
+    reconciled_time = models.DateTimeField(verbose_name='Reconciled time',
+                                           blank=True, null=True)
+    version = models.PositiveBigIntegerField(default=0,
+                                             verbose_name='Dataset version')
+
+    class Meta:
+        verbose_name_plural = 'Dataset stats'
+
+    def __str__(self) -> str:
+        return (f'Players: {self.players_count}, Cars: {self.cars_count}, '
+                f'Events: {self.events_count}')
@@ -0,0 +1,137 @@
+import datetime
+import math
+
+from dataclasses import dataclass
+
+from django.db.models import Q, QuerySet
+from django.http import QueryDict
+
+from dzllogparser.services.cache import get_cached
+
+
+CURSOR_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+CURSOR_SEPARATOR = '_'
+
+
+@dataclass
+class KeysetPage:
+    object_list: list
+    number: int
+    num_pages: int
+    count: int
+    next_cursor: str | None
+    previous_cursor: str | None
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    @property
+    def next_page_number(self) -> int:
+        return min(self.number + 1, self.num_pages)
+
+    @property
+    def previous_page_number(self) -> int:
+        return max(self.number - 1, 1)
+
+
+def encode_cursor(record, time_field: str = 'action_time') -> str:
+    """Returns cursor string from record time field value and pk."""
+    microseconds = (getattr(record, time_field) - CURSOR_EPOCH) // \
+        datetime.timedelta(microseconds=1)
+    return f'{microseconds}{CURSOR_SEPARATOR}{record.pk}'
+
+
+def decode_cursor(cursor: str | None) -> tuple[datetime.datetime, int] | None:
+    """Returns time and pk from cursor string,
+    or None if cursor is missing or invalid.
+    """
+    try:
+        microseconds, pk = map(int, cursor.split(CURSOR_SEPARATOR))
+    except (AttributeError, ValueError):
+        return None
+    return CURSOR_EPOCH + datetime.timedelta(microseconds=microseconds), pk
+
+
+def get_cached_count(queryset: QuerySet, cache_key: str) -> int:
+    """Returns queryset records number, cached for current dataset version.
+    """
+    return get_cached(cache_key, queryset.count)
+
+
+def get_seek_filter(time_field: str, cursor: tuple[datetime.datetime, int],
+                    descending: bool) -> Q:
+    """Returns filter for records following cursor
+    in (time_field, pk) ordering.
+    """
+    cursor_time, pk = cursor
+    lookup = 'lt' if descending else 'gt'
+    return Q(**{f'{time_field}__{lookup}e': cursor_time}) & (
+        Q(**{f'{time_field}__{lookup}': cursor_time}) |
+        Q(**{f'pk__{lookup}': pk})
+    )
+
+
+def get_keyset_page(queryset: QuerySet, params: QueryDict, per_page: int,
+                    count_cache_key: str, time_field: str = 'action_time',
+                    descending: bool = True) -> KeysetPage:
+    """Returns page of queryset records ordered by time_field and pk,
+    newest first if descending.
+    Page is selected by 'after' or 'before' cursor of neighbour page
+    or by 'last' parameter, so every page costs the same as the first.
+    'page' parameter is used only for page number displaying.
+    """
+    order_prefix = '-' if descending else ''
+    queryset = queryset.order_by(f'{order_prefix}{time_field}',
+                                 f'{order_prefix}pk')
+    count = get_cached_count(queryset, count_cache_key)
+    num_pages = max(math.ceil(count / per_page), 1)
+    after = decode_cursor(params.get('after'))
+    before = decode_cursor(params.get('before'))
+    if params.get('last'):
+        records = list(queryset.reverse()[:per_page + 1])
+        has_previous, has_next = len(records) > per_page, False
+        records = records[:per_page][::-1]
+        number = num_pages
+    elif before:
+        records = list(queryset.filter(
+            get_seek_filter(time_field, before, not descending)
+        ).reverse()[:per_page + 1])
+        has_previous, has_next = len(records) > per_page, True
+        records = records[:per_page][::-1]
+        number = None
+    elif after:
+        records = list(queryset.filter(
+            get_seek_filter(time_field, after, descending)
+        )[:per_page + 1])
+        has_previous, has_next = True, len(records) > per_page
+        records = records[:per_page]
+        number = None
+    else:
+        records = list(queryset[:per_page + 1])
+        has_previous, has_next = False, len(records) > per_page
+        records = records[:per_page]
+        number = 1
+    if number is None:
+        try:
+            number = int(params.get('page', 1))
+        except ValueError:
+            number = 1
+    if not has_previous:
+        number = 1
+    elif not has_next:
+        number = num_pages
+    return KeysetPage(
+        object_list=records,
+        number=min(max(number, 1), num_pages),
+        num_pages=num_pages,
+        count=count,
+        next_cursor=encode_cursor(records[-1], time_field)
+            if has_next else None,
+        previous_cursor=encode_cursor(records[0], time_field)
+            if has_previous else None,
+    )
@@ -0,0 +1,24 @@
+from typing import Any, Callable
+
+from django.core.cache import cache
+from django.http import QueryDict
+
+from dzllogparser.services.stats import get_dataset_stats
+
+
+def get_dataset_version() -> int:
+    """Returns dataset version, changed by every data import."""
+    return get_dataset_stats().version
+
+
+def get_params_key(params: QueryDict) -> str:
+    """Returns cache key part from request query parameters."""
+    return '&'.join(f'{key}={value}'
+                    for key, value in sorted(params.items()))
+
+
+def get_cached(key: str, default: Callable[[], Any]) -> Any:
+    """Returns value cached for current dataset version,
+    or calls default and caches its result.
+    """
+    return cache.get_or_set(key, default, version=get_dataset_version())
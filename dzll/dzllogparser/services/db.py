@@ -1,20 +1,45 @@
+import datetime
+import hashlib
 import logging
 import time
 
+from collections import Counter
 from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, Iterator
 
 from django.conf import settings
-from django.db.models import Q, Count
+from django.db import connection, transaction
+from django.db.models import F, Model, Q, Sum
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 
-from dzllogparser.models import Car, Player, Event
-from dzllogparser.services.parser import LogfileData
+from dzllogparser.models import (Action, AliasTrigram, Car, Player, Event,
+                                 IngestCheckpoint, PlayerAlias,
+                                 PlayerCarUsage)
+from dzllogparser.services.parser import (ACTION_TIMEZONE, LogfileData,
+                                         get_position_coordinates)
+from dzllogparser.services.parser import Car as ParsedCar
+from dzllogparser.services.parser import Player as ParsedPlayer
+from dzllogparser.services.cache import get_cached
+from dzllogparser.services.search import get_trigrams, normalize_name
+from dzllogparser.services.stats import update_dataset_stats
 
 
 db_logger = logging.getLogger(__name__)
 
 
+KEYS_QUERY_CHUNK_SIZE = 900
+BATCH_SIZE_SAMPLE = 100
+PACKET_SIZE_USAGE = 0.5
+FIELD_OVERHEAD_BYTES = 32
+DEDUP_CHUNK_SIZE = 5000
+PLAYER_UPDATE_FIELDS = ['dayzname', 'dayz_alt_names']
+CAR_UPDATE_FIELDS = ['car_status', 'deletion_time', 'last_init_time',
+                     'position', 'last_using_time']
+
+
 @dataclass
 class RecordsStatus:
     players_created: int = 0
@@ -23,6 +48,17 @@ class RecordsStatus:
     car_updated: int = 0
     car_deleted: int = 0
     events_created: int = 0
+    events_deleted: int = 0
+    players_time: float = 0.0
+    cars_time: float = 0.0
+    events_time: float = 0.0
+    elapsed_time: float = 0.0
+
+
+@dataclass
+class DedupStatus:
+    events_hashed: int = 0
+    events_deleted: int = 0
     elapsed_time: float = 0.0
 
 
@@ -34,28 +70,43 @@ class OwnersCarStat:
 
 
 def import_logfile_data_into_db(logfile_data: LogfileData,
-                                days_limit: int = 0) -> RecordsStatus:
-    """Calls functions to load data into db"""
+                                days_limit: int = 0,
+                                continued: bool = False) -> RecordsStatus:
+    """Calls functions to load data into db in one transaction,
+    so failed import leaves db unchanged.
+    continued is True for data parsed from the tail of a logfile.
+    """
     start_time = time.monotonic()
-    player_created_records, player_updated_players = import_players_into_db(
-        logfile_data.players)
-    db_logger.info(
-        f'Player records created: {player_created_records}. '
-        f'Player records updated: {player_updated_players}. '
-    )
-    (car_created_records, car_updated_records,
-            car_deleted_records) = import_cars_into_db(logfile_data.cars,
-                                                       days_limit)
-    db_logger.info(
-        f'Car records created: {car_created_records}. '
-        f'Car records updated: {car_updated_records}. '
-        f'Old records has been deleted: {car_deleted_records}. '
-    )
-    events_record_result = import_events_into_db(logfile_data.events)
-    db_logger.info(
-        f'Event records created: {events_record_result}.'
-    )
+    with transaction.atomic():
+        player_created_records, player_updated_players = \
+            import_players_into_db(logfile_data.players)
+        import_player_aliases_into_db(logfile_data.players)
+        db_logger.info(
+            f'Player records created: {player_created_records}. '
+            f'Player records updated: {player_updated_players}. '
+        )
+        players_time = time.monotonic() - start_time
+        (car_created_records, car_updated_records, car_deleted_records,
+                events_deleted_records) = import_cars_into_db(
+                    logfile_data.cars, days_limit, continued)
+        db_logger.info(
+            f'Car records created: {car_created_records}. '
+            f'Car records updated: {car_updated_records}. '
+            f'Old records has been deleted: {car_deleted_records} '
+            f'with {events_deleted_records} events. '
+        )
+        cars_time = time.monotonic() - start_time - players_time
+        events_record_result = import_events_into_db(logfile_data.events)
+        db_logger.info(
+            f'Event records created: {events_record_result}.'
+        )
+        update_dataset_stats(
+            players=player_created_records,
+            cars=car_created_records - car_deleted_records,
+            events=events_record_result - events_deleted_records,
+        )
     elapsed_time = time.monotonic() - start_time
+    events_time = elapsed_time - players_time - cars_time
     db_logger.info(f'Eplased time: {elapsed_time}.')
     return RecordsStatus(
         players_created=player_created_records,
@@ -64,68 +115,273 @@ def import_logfile_data_into_db(logfile_data: LogfileData,
         car_updated=car_updated_records,
         car_deleted=car_deleted_records,
         events_created=events_record_result,
+        events_deleted=events_deleted_records,
+        players_time=round(players_time, 3),
+        cars_time=round(cars_time, 3),
+        events_time=round(events_time, 3),
         elapsed_time=round(elapsed_time, 3)
     )
 
 
+@lru_cache(maxsize=1)
+def get_max_packet_size() -> int | None:
+    """Returns maximal statement size accepted by db server,
+    DB_MAX_PACKET_SIZE or MySQL max_allowed_packet.
+    """
+    if settings.DB_MAX_PACKET_SIZE:
+        return settings.DB_MAX_PACKET_SIZE
+    if connection.vendor != 'mysql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT @@max_allowed_packet')
+        return int(cursor.fetchone()[0])
+
+
+def get_batch_size(records: list[Model], default_batch_size: int) -> int:
+    """Returns batch size not bigger than default_batch_size,
+    keeping bulk statement size within half of max packet size.
+    Record size is estimated by the largest of first records.
+    """
+    max_packet_size = get_max_packet_size()
+    if not max_packet_size or not records:
+        return default_batch_size
+    record_size = max(
+        sum(len(str(getattr(record, field.attname))) + FIELD_OVERHEAD_BYTES
+            for field in record._meta.concrete_fields)
+        for record in records[:BATCH_SIZE_SAMPLE]
+    )
+    return max(1, min(default_batch_size,
+                      int(max_packet_size * PACKET_SIZE_USAGE) // record_size))
+
+
+def bulk_create_records(model: type[Model], records: list[Model],
+                        default_batch_size: int | None = None,
+                        **options) -> list[Model]:
+    """Creates records with bulk_create in adaptive batches,
+    DB_INSERT_BATCH_SIZE records at most by default.
+    """
+    batch_size = get_batch_size(
+        records, default_batch_size or settings.DB_INSERT_BATCH_SIZE)
+    return model.objects.bulk_create(records, batch_size=batch_size,
+                                     **options)
+
+
+def bulk_update_records(model: type[Model], records: list[Model],
+                        fields: list[str]) -> int:
+    """Updates records fields with bulk_update in adaptive batches,
+    DB_UPDATE_BATCH_SIZE records at most.
+    """
+    batch_size = get_batch_size(records, settings.DB_UPDATE_BATCH_SIZE)
+    return model.objects.bulk_update(records, fields, batch_size=batch_size)
+
+
+def get_key_chunks(keys: Iterable[str]) -> Iterator[list[str]]:
+    """Returns Iterator with lists of KEYS_QUERY_CHUNK_SIZE keys."""
+    keys_list = list(keys)
+    for index in range(0, len(keys_list), KEYS_QUERY_CHUNK_SIZE):
+        yield keys_list[index:index + KEYS_QUERY_CHUNK_SIZE]
+
+
+def get_records_by_keys(model: type[Model], key_field: str,
+                        keys: Iterable[str]) -> list[Model]:
+    """Returns model records with key_field value in keys.
+    Keys are queried in chunks of KEYS_QUERY_CHUNK_SIZE.
+    """
+    records = []
+    for keys_chunk in get_key_chunks(keys):
+        records.extend(
+            model.objects.filter(**{f'{key_field}__in': keys_chunk}))
+    return records
+
+
+def get_pk_map_by_keys(model: type[Model], key_field: str,
+                       keys: Iterable[str]) -> dict[str, int]:
+    """Returns dict with key_field value to primary key mapping
+    for model records with key_field value in keys.
+    """
+    pk_map = dict()
+    for keys_chunk in get_key_chunks(keys):
+        pk_map.update(
+            model.objects.filter(**{f'{key_field}__in': keys_chunk})
+            .values_list(key_field, 'pk')
+        )
+    return pk_map
+
+
+def get_alt_names_str(player: ParsedPlayer) -> str:
+    """Returns player alternate names as sorted comma separated string."""
+    return ', '.join(sorted(player.alter_names))
+
+
+def set_changed_fields(record: Model, new_values: dict) -> bool:
+    """Sets new values to record fields,
+    and returns True if any of them differs from the current one.
+    """
+    changed = False
+    for field_name, value in new_values.items():
+        if getattr(record, field_name) != value:
+            setattr(record, field_name, value)
+            changed = True
+    return changed
+
+
 def import_players_into_db(players: dict) -> tuple[int, int]:
-    """Add new players into db and updating existing,
+    """Add new players into db and updating changed existing,
     and returns numbers of created and updated records.
     """
-    queryset_objects_steam_id = Player.objects.values_list('steam_id')
-    players_to_create = []
-    players_to_update = []
-    existing_steam_id_list = [
-        steam_id for steam_id, in queryset_objects_steam_id]
-    for steam_id, player in players.items():
-        if steam_id in existing_steam_id_list:
-            players_to_update.append(player)
-        else:
-            players_to_create.append(player)
-    created_records = Player.objects.bulk_create(
+    if settings.DB_UPSERT_IMPORT:
+        return upsert_players_into_db(players)
+    existing_records_in_db = get_records_by_keys(Player, 'steam_id',
+                                                 players.keys())
+    existing_steam_id_set = {
+        player_record.steam_id for player_record in existing_records_in_db}
+    players_to_create = [
+        player for steam_id, player in players.items()
+        if steam_id not in existing_steam_id_set
+    ]
+    created_records = bulk_create_records(
+        Player,
         [
             Player(steam_id=player.steam_id, dayzname=player.name,
-                   dayz_alt_names=', '.join(player.alter_names))
+                   dayz_alt_names=get_alt_names_str(player))
             for player in players_to_create
-        ],
-        batch_size=500
+        ]
     )
-    existing_records_in_db = Player.objects.filter(
-        steam_id__in=[player.steam_id for player in players_to_update])
+    records_for_update = [
+        player_record for player_record in existing_records_in_db
+        if set_changed_fields(
+            player_record,
+            {
+                'dayzname': players[player_record.steam_id].name,
+                'dayz_alt_names': get_alt_names_str(
+                    players[player_record.steam_id]),
+            }
+        )
+    ]
+    updated_players = bulk_update_records(Player, records_for_update,
+                                          PLAYER_UPDATE_FIELDS)
+    return (len(created_records), updated_players)
+
+
+def import_player_aliases_into_db(players: dict) -> None:
+    """Adds new player nicknames into PlayerAlias with their trigrams,
+    and extends first and last seen time of existing ones.
+    """
+    players_pk_map = get_pk_map_by_keys(Player, 'steam_id', players.keys())
+    names_seen = {
+        (players_pk_map[steam_id], name): seen_times
+        for steam_id, player in players.items()
+        for name, seen_times in player.names_seen.items()
+    }
     records_for_update = []
-    for player_record in existing_records_in_db:
-        current_player = players.get(player_record.steam_id)
-        if player_record.dayzname != current_player:
-            player_record.dayzname = current_player.name
-            player_record.dayz_alt_names = ', '.join(
-                current_player.alter_names)
-            records_for_update.append(player_record)
-        else:
-            continue
-    updated_players = Player.objects.bulk_update(
-        records_for_update, ['dayzname', 'dayz_alt_names'],
-        batch_size=500
+    for players_chunk in get_key_chunks(players_pk_map.values()):
+        for alias in PlayerAlias.objects.filter(player_id__in=players_chunk):
+            seen_times = names_seen.pop((alias.player_id, alias.name), None)
+            if seen_times and set_changed_fields(alias, {
+                'first_seen_time': min(
+                    filter(None, (alias.first_seen_time, seen_times[0]))),
+                'last_seen_time': max(
+                    filter(None, (alias.last_seen_time, seen_times[1]))),
+            }):
+                records_for_update.append(alias)
+    bulk_update_records(PlayerAlias, records_for_update,
+                        ['first_seen_time', 'last_seen_time'])
+    new_aliases = bulk_create_records(
+        PlayerAlias,
+        [
+            PlayerAlias(player_id=player_id, name=name,
+                        normalized_name=normalize_name(name),
+                        first_seen_time=first_seen, last_seen_time=last_seen)
+            for (player_id, name), (first_seen, last_seen)
+            in names_seen.items()
+        ],
+        ignore_conflicts=True
     )
-    return (len(created_records), updated_players)
+    if new_aliases:
+        import_alias_trigrams_into_db(set(names_seen.keys()))
 
 
-def import_cars_into_db(cars: dict,
-                        days_limit: int = 0) -> tuple[int, int, int]:
+def import_alias_trigrams_into_db(alias_keys: set[tuple[int, str]]) -> None:
+    """Adds trigrams of aliases with (player pk, name) in alias_keys
+    into AliasTrigram.
+    """
+    aliases = []
+    for players_chunk in get_key_chunks(
+            {player_id for player_id, _ in alias_keys}):
+        aliases.extend(
+            alias for alias in PlayerAlias.objects.filter(
+                player_id__in=players_chunk)
+            if (alias.player_id, alias.name) in alias_keys
+        )
+    bulk_create_records(
+        AliasTrigram,
+        [
+            AliasTrigram(alias=alias, trigram=trigram)
+            for alias in aliases
+            for trigram in get_trigrams(alias.normalized_name)
+        ],
+        ignore_conflicts=True
+    )
+
+
+def import_cars_into_db(cars: dict, days_limit: int = 0,
+                        continued: bool = False
+                        ) -> tuple[int, int, int, int]:
     """Add new cars into db, updating existing 
     and also deletes old deleted cars records.
-    Returns numbers of created, updated and deleted records.
-    """
-    queryset_objects_steam_id = Car.objects.values_list('car_id')
-    cars_to_create = []
-    cars_to_update = []
-    existing_car_id_list = [
-        car_id for car_id, in queryset_objects_steam_id]
-    for car_id, car in cars.items():
-        if car_id in existing_car_id_list:
-            cars_to_update.append(car)
-        else:
-            cars_to_create.append(car)
-    created_records = Car.objects.bulk_create(
+    Returns numbers of created, updated and deleted records
+    and number of deleted events of deleted cars.
+    """
+    if settings.DB_UPSERT_IMPORT:
+        created_records, updated_records = upsert_cars_into_db(cars,
+                                                               continued)
+    else:
+        created_records, updated_records = update_cars_into_db(cars,
+                                                               continued)
+    if days_limit:
+        limit_datetime = timezone.now() - timezone.timedelta(
+            days=days_limit)
+        _, deleted_by_model = Car.objects.filter(
+            deletion_time__lt=limit_datetime).delete()
+        deleted_records = deleted_by_model.get(Car._meta.label, 0)
+        deleted_events = deleted_by_model.get(Event._meta.label, 0)
+    else:
+        deleted_records = deleted_events = 0
+    return (created_records, updated_records, deleted_records,
+            deleted_events)
+
+
+def get_car_update_values(car: ParsedCar, continued: bool = False) -> dict:
+    """Returns car record values to update from parsed car.
+    Missing last use time is not updated, as well as missing init time
+    in continued logfile, where init lines were parsed before.
+    """
+    update_values = {
+        'car_status': car.status,
+        'deletion_time': car.deletion_time,
+        'position': car.position,
+    }
+    if car.last_init_time or not continued:
+        update_values['last_init_time'] = car.last_init_time
+    if car.last_use_time:
+        update_values['last_using_time'] = car.last_use_time
+    return update_values
+
+
+def update_cars_into_db(cars: dict,
+                        continued: bool = False) -> tuple[int, int]:
+    """Add new cars into db and updating changed existing,
+    and returns numbers of created and updated records.
+    """
+    existing_records_in_db = get_records_by_keys(Car, 'car_id', cars.keys())
+    existing_car_id_set = {
+        car_record.car_id for car_record in existing_records_in_db}
+    cars_to_create = [
+        car for car_id, car in cars.items()
+        if car_id not in existing_car_id_set
+    ]
+    created_records = bulk_create_records(
+        Car,
         [
             Car(car_id=car.car_id, name=car.name, car_type=car.car_type,
                 position=car.position, car_status=car.status,
@@ -133,83 +389,401 @@ def import_cars_into_db(cars: dict,
                 deletion_time=car.deletion_time,
                 last_using_time=car.last_use_time)
             for car in cars_to_create
-        ],
-        batch_size=500
+        ]
     )
-    existing_records_in_db = Car.objects.filter(
-        car_id__in=[car_id for car_id in cars.keys()])
+    records_for_update = []
     for car_record in existing_records_in_db:
-        current_car = cars.get(car_record.car_id)
-        car_record.car_status=current_car.status
-        car_record.deletion_time = current_car.deletion_time
-        car_record.last_init_time = current_car.last_init_time
-        car_record.position = current_car.position
-        if current_car.last_use_time:
-            car_record.last_using_time = current_car.last_use_time
-    updated_records = Car.objects.bulk_update(
-        existing_records_in_db,
-        ['car_status', 'deletion_time', 'last_init_time',
-         'position', 'last_using_time'],
-        batch_size=500
+        new_values = get_car_update_values(cars[car_record.car_id],
+                                           continued)
+        if set_changed_fields(car_record, new_values):
+            records_for_update.append(car_record)
+    updated_records = bulk_update_records(Car, records_for_update,
+                                          CAR_UPDATE_FIELDS)
+    return (len(created_records), updated_records)
+
+
+def get_upsert_options(unique_field: str,
+                       update_fields: list[str]) -> dict:
+    """Returns bulk_create keyword arguments for insert or update
+    on unique field conflict. MySQL does not accept unique_fields,
+    it uses any conflicting unique index.
+    """
+    upsert_options = {
+        'update_conflicts': True,
+        'update_fields': update_fields,
+    }
+    if connection.features.supports_update_conflicts_with_target:
+        upsert_options['unique_fields'] = [unique_field]
+    return upsert_options
+
+
+def upsert_players_into_db(players: dict) -> tuple[int, int]:
+    """Insert or update players with one bulk statement per batch,
+    and returns numbers of created and updated records.
+    """
+    existing_records_number = len(
+        get_pk_map_by_keys(Player, 'steam_id', players.keys()))
+    bulk_create_records(
+        Player,
+        [
+            Player(steam_id=player.steam_id, dayzname=player.name,
+                   dayz_alt_names=get_alt_names_str(player))
+            for player in players.values()
+        ],
+        default_batch_size=settings.DB_UPDATE_BATCH_SIZE,
+        **get_upsert_options('steam_id', PLAYER_UPDATE_FIELDS)
     )
-    if days_limit:
-        limit_datetime = timezone.now() - timezone.timedelta(
-            days=days_limit)
-        deleted_records, _ = Car.objects.filter(
-            deletion_time__lt=limit_datetime).delete()
-    else:
-        deleted_records = 0
-    return (len(created_records), updated_records, deleted_records)
+    return (len(players) - existing_records_number, existing_records_number)
+
+
+def upsert_cars_into_db(cars: dict,
+                        continued: bool = False) -> tuple[int, int]:
+    """Insert or update cars with one bulk statement per batch
+    and set of updated fields, and returns numbers of created
+    and updated records.
+    """
+    existing_records_number = len(
+        get_pk_map_by_keys(Car, 'car_id', cars.keys()))
+    cars_by_update_fields = dict()
+    for car in cars.values():
+        update_fields = tuple(get_car_update_values(car, continued).keys())
+        cars_by_update_fields.setdefault(update_fields, []).append(
+            Car(car_id=car.car_id, name=car.name, car_type=car.car_type,
+                position=car.position, car_status=car.status,
+                last_init_time=car.last_init_time,
+                deletion_time=car.deletion_time,
+                last_using_time=car.last_use_time)
+        )
+    for update_fields, car_records in cars_by_update_fields.items():
+        bulk_create_records(
+            Car, car_records,
+            default_batch_size=settings.DB_UPDATE_BATCH_SIZE,
+            **get_upsert_options('car_id', list(update_fields))
+        )
+    return (len(cars) - existing_records_number, existing_records_number)
+
+
+def get_action_pk_map(action_names: set[str]) -> dict[str, int]:
+    """Returns dict with action name to Action pk mapping,
+    missing actions are created.
+    """
+    Action.objects.bulk_create(
+        [Action(name=action_name) for action_name in action_names],
+        ignore_conflicts=True
+    )
+    return get_pk_map_by_keys(Action, 'name', action_names)
+
+
+def get_event_hash(action_time: datetime.datetime, car_id: int,
+                   player_id: int | None, action_id: int) -> str:
+    """Returns event natural key hash: time, car, player and action."""
+    event_key = (f'{int(action_time.timestamp())}|{car_id}|'
+                 f'{player_id or ""}|{action_id}')
+    return hashlib.md5(event_key.encode()).hexdigest()
 
 
 def import_events_into_db(events_list: list) -> int:
-    """Add new events into db, and returns number of created records"""
-    created_records = Event.objects.bulk_create([
-        Event(action_time=event.event_time,
-              player=Player.objects.get(steam_id=event.player.steam_id) \
-                  if event.player else None,
-              car=Car.objects.get(car_id=event.car_id),
-              action=event.action, position=event.position)
-        for event in events_list
-    ], batch_size=950)
+    """Add new events into db, and returns number of created records.
+    Events already stored in db are skipped, so import can be repeated.
+    """
+    actions_pk_map = get_action_pk_map(
+        {event.action for event in events_list})
+    players_pk_map = get_pk_map_by_keys(
+        Player, 'steam_id',
+        {event.player.steam_id for event in events_list if event.player}
+    )
+    cars_pk_map = get_pk_map_by_keys(
+        Car, 'car_id', {event.car_id for event in events_list})
+    new_events = dict()
+    for event in events_list:
+        position_x, position_y, position_z = get_position_coordinates(
+            event.position)
+        player_id = players_pk_map[event.player.steam_id] \
+            if event.player else None
+        car_id = cars_pk_map[event.car_id]
+        action_id = actions_pk_map[event.action]
+        event_hash = get_event_hash(event.event_time, car_id, player_id,
+                                    action_id)
+        if event_hash in new_events:
+            continue
+        new_events[event_hash] = Event(
+            action_time=event.event_time, player_id=player_id,
+            car_id=car_id, action_id=action_id,
+            position_x=position_x, position_y=position_y,
+            position_z=position_z, event_hash=event_hash
+        )
+    created_records = create_new_events(new_events)
+    import_car_usage_into_db(created_records)
     return len(created_records)
 
 
-def change_status_for_phantoms() -> None:
-    """Change car status to deleted if car not initialized for the last 6 
-    hours
+def remove_stored_events(new_events: dict[str, Event]) -> None:
+    """Removes events with hashes already stored in db from dict."""
+    for event_hash in get_pk_map_by_keys(Event, 'event_hash', new_events):
+        del new_events[event_hash]
+
+
+def create_new_events(new_events: dict[str, Event]) -> list[Event]:
+    """Creates events with hashes not stored in db and returns them.
+    Events stored by concurrent import after the hash lookup are skipped
+    by the unique hash index. Created events are found by their hashes
+    after insert among events with primary key above the last one before
+    insert, so skipped events stored earlier are not returned.
     """
-    limit_phantom_time = timezone.now() - timezone.timedelta(hours=6)
-    phantom_vehicle_list = Car.objects.filter(
+    remove_stored_events(new_events)
+    last_pk = Event.objects.order_by('-pk').values_list(
+        'pk', flat=True).first() or 0
+    bulk_create_records(Event, list(new_events.values()),
+                        ignore_conflicts=True)
+    created_events = []
+    for hashes_chunk in get_key_chunks(new_events):
+        created_events.extend(Event.objects.filter(
+            event_hash__in=hashes_chunk, pk__gt=last_pk))
+    return created_events
+
+
+def import_car_usage_into_db(events: list[Event]) -> None:
+    """Adds player events numbers per car and day into PlayerCarUsage."""
+    usage_counter = Counter(
+        (event.player_id, event.car_id,
+         event.action_time.astimezone(ACTION_TIMEZONE).date())
+        for event in events if event.player_id
+    )
+    if not usage_counter:
+        return
+    days = {day for _, _, day in usage_counter}
+    records_for_update = []
+    for players_chunk in get_key_chunks(
+            {player_id for player_id, _, _ in usage_counter}):
+        for record in PlayerCarUsage.objects.filter(
+                player_id__in=players_chunk, day__in=days):
+            key = (record.player_id, record.car_id, record.day)
+            if key in usage_counter:
+                record.events_count += usage_counter.pop(key)
+                records_for_update.append(record)
+    bulk_update_records(PlayerCarUsage, records_for_update, ['events_count'])
+    bulk_create_records(PlayerCarUsage, [
+        PlayerCarUsage(player_id=player_id, car_id=car_id, day=day,
+                       events_count=events_count)
+        for (player_id, car_id, day), events_count in usage_counter.items()
+    ])
+
+
+def remove_car_usage_of_events(events: list[Event]) -> None:
+    """Subtracts deleted player events numbers from PlayerCarUsage."""
+    usage_counter = Counter(
+        (event.player_id, event.car_id,
+         event.action_time.astimezone(ACTION_TIMEZONE).date())
+        for event in events if event.player_id
+    )
+    records_for_update = []
+    for players_chunk in get_key_chunks(
+            {player_id for player_id, _, _ in usage_counter}):
+        for record in PlayerCarUsage.objects.filter(
+                player_id__in=players_chunk,
+                day__in={day for _, _, day in usage_counter}):
+            key = (record.player_id, record.car_id, record.day)
+            if key in usage_counter:
+                record.events_count = max(
+                    record.events_count - usage_counter[key], 0)
+                records_for_update.append(record)
+    bulk_update_records(PlayerCarUsage, records_for_update, ['events_count'])
+    PlayerCarUsage.objects.filter(
+        pk__in=[record.pk for record in records_for_update
+                if not record.events_count]
+    ).delete()
+
+
+def set_events_hashes(events_by_hash: dict[str, Event]) -> None:
+    """Saves event hashes with one parametrized statement,
+    bulk_update CASE expressions are too slow for millions of rows.
+    """
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'UPDATE {Event._meta.db_table} SET event_hash = %s '
+            f'WHERE id = %s',
+            [(event_hash, event.pk)
+             for event_hash, event in events_by_hash.items()]
+        )
+
+
+def dedup_events(chunk_size: int = DEDUP_CHUNK_SIZE) -> DedupStatus:
+    """Sets hashes for events stored without them and deletes
+    duplicated events, keeping one of them.
+    Every chunk of events is processed in its own transaction.
+    """
+    start_time = time.monotonic()
+    status = DedupStatus()
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            events = list(Event.objects.filter(
+                event_hash__isnull=True, pk__gt=last_pk
+            ).order_by('pk')[:chunk_size])
+            if not events:
+                break
+            last_pk = events[-1].pk
+            events_by_hash = dict()
+            duplicates = []
+            for event in events:
+                event.event_hash = get_event_hash(
+                    event.action_time, event.car_id, event.player_id,
+                    event.action_id)
+                if event.event_hash in events_by_hash:
+                    duplicates.append(event)
+                else:
+                    events_by_hash[event.event_hash] = event
+            for hashes_chunk in get_key_chunks(list(events_by_hash)):
+                for event_hash in Event.objects.filter(
+                        event_hash__in=hashes_chunk).values_list(
+                            'event_hash', flat=True):
+                    duplicates.append(events_by_hash.pop(event_hash))
+            for pk_chunk in get_key_chunks(
+                    [event.pk for event in duplicates]):
+                Event.objects.filter(pk__in=pk_chunk).delete()
+            set_events_hashes(events_by_hash)
+            remove_car_usage_of_events(duplicates)
+            if duplicates:
+                update_dataset_stats(events=-len(duplicates))
+        status.events_hashed += len(events_by_hash)
+        status.events_deleted += len(duplicates)
+        db_logger.info(
+            f'Events hashed: {status.events_hashed}. '
+            f'Duplicated events deleted: {status.events_deleted}.'
+        )
+    status.elapsed_time = round(time.monotonic() - start_time, 3)
+    return status
+
+
+def get_ingest_checkpoints(
+        directory_list: list[str]) -> dict[str, IngestCheckpoint]:
+    """Returns dict with directory to import checkpoint mapping."""
+    return {
+        checkpoint.directory: checkpoint
+        for checkpoint in IngestCheckpoint.objects.filter(
+            directory__in=directory_list)
+    }
+
+
+def save_ingest_checkpoint(
+        directory: str, byte_offset: int,
+        status: str = IngestCheckpoint.CheckpointStatus.DONE) -> None:
+    """Saves directory import status and number of imported bytes."""
+    IngestCheckpoint.objects.update_or_create(
+        directory=directory,
+        defaults={'byte_offset': byte_offset, 'status': status}
+    )
+
+
+def mark_ingest_checkpoint_failed(directory: str) -> None:
+    """Saves failed directory import status, keeping the number of bytes
+    imported before, so the next tail import resumes from it.
+    """
+    IngestCheckpoint.objects.update_or_create(
+        directory=directory,
+        defaults={'status': IngestCheckpoint.CheckpointStatus.FAILED}
+    )
+
+
+def mark_directories_processed(directory_list: list[str]) -> None:
+    """Saves finished import checkpoints for directories
+    imported before checkpoints were introduced.
+    """
+    bulk_create_records(
+        IngestCheckpoint,
+        [
+            IngestCheckpoint(directory=directory)
+            for directory in directory_list
+        ],
+        ignore_conflicts=True
+    )
+
+
+def get_processed_directories(directory_list: list[str]) -> set[str]:
+    """Returns directories from list with finished import checkpoint."""
+    return set(IngestCheckpoint.objects.filter(
+        directory__in=directory_list,
+        status=IngestCheckpoint.CheckpointStatus.DONE
+    ).values_list('directory', flat=True))
+
+
+def change_status_for_phantoms(dry_run: bool = False) -> int:
+    """Change car status to deleted if car not initialized for the last
+    PHANTOM_INIT_HOURS hours, deletion time is set to PHANTOM_DELETION_HOURS
+    after last init time. Returns number of phantom cars, in dry run mode
+    cars are only counted.
+    """
+    limit_phantom_time = timezone.now() - timezone.timedelta(
+        hours=settings.PHANTOM_INIT_HOURS)
+    phantom_vehicles = Car.objects.filter(
         Q(last_init_time__lt=limit_phantom_time) |
         Q(last_init_time__isnull=True)).exclude(
             car_status=Car.CarStatus.DELETED)
-    for phantom_vehicle in phantom_vehicle_list:
-        phantom_vehicle.car_status='DELETED'
-        try:
-            phantom_vehicle.deletion_time=phantom_vehicle.last_init_time + \
-                timezone.timedelta(hours=3)
-        except TypeError:
-            pass
-    Car.objects.bulk_update(
-        phantom_vehicle_list, ['car_status', 'deletion_time'], batch_size=500
+    if dry_run:
+        return phantom_vehicles.count()
+    updated_records = phantom_vehicles.update(
+        car_status=Car.CarStatus.DELETED,
+        deletion_time=Coalesce(
+            F('last_init_time') + timezone.timedelta(
+                hours=settings.PHANTOM_DELETION_HOURS),
+            F('deletion_time')
+        )
     )
+    if updated_records:
+        update_dataset_stats()
+    return updated_records
+
+
+def get_owned_cars_usage(**filters) -> Iterable[dict]:
+    """Returns player and car pairs with more than
+    MINIMAL_ENEVT_COUNT_CRITERIA events in the last
+    MINIMAL_USED_DAYS_CRITERIA days, read from PlayerCarUsage.
+    """
+    start_day = datetime.datetime.now(ACTION_TIMEZONE).date() - \
+        datetime.timedelta(days=settings.MINIMAL_USED_DAYS_CRITERIA)
+    return PlayerCarUsage.objects.filter(
+        day__gte=start_day, **filters
+    ).values('player', 'car').annotate(
+        events_sum=Sum('events_count')
+    ).filter(events_sum__gt=settings.MINIMAL_ENEVT_COUNT_CRITERIA)
 
 
 def get_player_cars(steam_id: str) -> OwnersCarStat:
     """Returns OwnersCarStat with count of player cars, and cars list"""
     player = get_object_or_404(Player, steam_id=steam_id)
-    interval = timezone.now() - timezone.timedelta(
-    days=settings.MINIMAL_USED_DAYS_CRITERIA)
-    cars_stat = Event.objects.filter(
-        player=player,
-        action_time__gte=interval
-    ).select_related('car', 'player').values('car').annotate(Count('car'))
-    cars_id_list = [
-        car['car']
-        for car in cars_stat
-        if car['car__count'] > settings.MINIMAL_ENEVT_COUNT_CRITERIA
+
+    def get_owners_car_stat() -> OwnersCarStat:
+        cars_id_list = [
+            usage['car'] for usage in get_owned_cars_usage(player=player)
+        ]
+        cars_list = list(Car.objects.filter(id__in=cars_id_list))
+        return OwnersCarStat(owner=player, car_count=len(cars_list),
+                             cars_list=cars_list)
+
+    return get_cached(f'player_cars:{player.pk}', get_owners_car_stat)
+
+
+def get_owners_ranking() -> list[OwnersCarStat]:
+    """Returns OwnersCarStat of all car owners,
+    ordered by number of owned cars, cached for current dataset version.
+    """
+    return get_cached('owners_ranking', get_owners_ranking_from_db)
+
+
+def get_owners_ranking_from_db() -> list[OwnersCarStat]:
+    """Returns OwnersCarStat of all car owners,
+    ordered by number of owned cars.
+    """
+    owned_cars = dict()
+    for usage in get_owned_cars_usage():
+        owned_cars.setdefault(usage['player'], []).append(usage['car'])
+    players = Player.objects.in_bulk(owned_cars.keys())
+    cars = Car.objects.in_bulk(
+        [car_pk for cars_pks in owned_cars.values() for car_pk in cars_pks])
+    ranking = [
+        OwnersCarStat(owner=players[player_pk], car_count=len(cars_pks),
+                      cars_list=[cars[car_pk] for car_pk in cars_pks])
+        for player_pk, cars_pks in owned_cars.items()
     ]
-    cars_list = list(Car.objects.filter(id__in=cars_id_list))
-    return OwnersCarStat(owner=player, car_count=len(cars_list),
-                         cars_list=cars_list)
+    ranking.sort(key=lambda owner_stat: owner_stat.car_count, reverse=True)
+    return ranking
@@ -0,0 +1,69 @@
+import csv
+import json
+
+from typing import Iterator
+
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = ('csv', 'json')
+
+
+class EchoBuffer:
+    """File-like object returning written value, used by csv.writer."""
+    def write(self, value: str) -> str:
+        return value
+
+
+def get_rows_in_chunks(queryset: QuerySet,
+                       fields: tuple[str, ...]) -> Iterator[tuple]:
+    """Yields queryset rows fields values, reading EXPORT_CHUNK_SIZE rows
+    per query ordered by pk, so memory does not depend on table size.
+    """
+    last_pk = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_pk).order_by('pk')
+                    .values_list('pk', *fields)[:EXPORT_CHUNK_SIZE])
+        if not rows:
+            return
+        for row in rows:
+            yield row[1:]
+        last_pk = rows[-1][0]
+
+
+def get_csv_lines(queryset: QuerySet,
+                  fields: tuple[str, ...]) -> Iterator[str]:
+    """Yields csv header and queryset rows lines."""
+    writer = csv.writer(EchoBuffer())
+    yield writer.writerow(fields)
+    for row in get_rows_in_chunks(queryset, fields):
+        yield writer.writerow(row)
+
+
+def get_json_lines(queryset: QuerySet,
+                   fields: tuple[str, ...]) -> Iterator[str]:
+    """Yields json array of queryset rows objects by parts."""
+    yield '['
+    separator = '\n'
+    for row in get_rows_in_chunks(queryset, fields):
+        yield separator + json.dumps(dict(zip(fields, row)), default=str,
+                                     ensure_ascii=False)
+        separator = ',\n'
+    yield '\n]\n'
+
+
+def get_export_response(queryset: QuerySet, fields: tuple[str, ...],
+                        export_format: str,
+                        file_name: str) -> StreamingHttpResponse:
+    """Returns response streaming queryset fields in csv or json format."""
+    if export_format == 'json':
+        content, content_type = get_json_lines(queryset, fields), \
+            'application/json'
+    else:
+        content, content_type = get_csv_lines(queryset, fields), 'text/csv'
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = \
+        f'attachment; filename="{file_name}.{export_format}"'
+    return response
@@ -1,97 +1,537 @@
+import codecs
 import datetime
 import ftplib
 import logging
 import os
+import queue
+import threading
 import time
-from typing import Generator
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import BinaryIO, Callable, Generator, Iterable, NamedTuple
 
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
 from django.utils import timezone
 
 from dzllogparser.services.parser import (defenition_logfile_data,
-                                          get_date_from_timestamp_str)
+                                          get_date_from_timestamp_str,
+                                          LogfileData)
 from dzllogparser.services.db import (
-    import_logfile_data_into_db, RecordsStatus, change_status_for_phantoms)
-from dzllogparser.models import Event
+    import_logfile_data_into_db, RecordsStatus, change_status_for_phantoms,
+    get_ingest_checkpoints, get_processed_directories,
+    mark_directories_processed, mark_ingest_checkpoint_failed,
+    save_ingest_checkpoint)
+from dzllogparser.services.logcache import (LOG_CACHE_READ_ERRORS,
+                                            LOG_CACHE_READ_SIZE,
+                                            LogCacheKey, LogfileCacheWriter,
+                                            open_cached_logfile,
+                                            read_cached_logfile,
+                                            remove_broken_cache_entry,
+                                            save_logfile_into_cache)
+from dzllogparser.models import Event, IngestCheckpoint
 
 
 ftp_logger = logging.getLogger(__name__)
 
 
+LOGFILE_LINE_SEPARATOR = '\r\n'
+STREAM_QUEUE_SIZE = 64
+STREAM_PUT_TIMEOUT = 0.5
+
+
+class LogfileStreamCancelled(Exception):
+    """Raised in download thread when logfile stream consumer has gone."""
+
+
+class ParsedLogfile(NamedTuple):
+    dir_name: str
+    size: int
+    logfile_data: LogfileData
+    continued: bool = False
+    closed: bool = True
+
+
+class LogfileLines:
+    """Iterable over logfile strings, counts their size in bytes.
+    complete_size excludes the last unfinished line.
+    """
+
+    def __init__(self, file_strings: Iterable[str]) -> None:
+        self._file_strings = file_strings
+        self.size = 0
+        self.complete_size = 0
+
+    def __iter__(self) -> Generator[str, None, None]:
+        separator_size = len(LOGFILE_LINE_SEPARATOR)
+        self.size = -separator_size
+        file_string_size = 0
+        for file_string in self._file_strings:
+            file_string_size = len(file_string.encode('utf-8'))
+            self.size += file_string_size + separator_size
+            yield file_string
+        self.size = max(self.size, 0)
+        self.complete_size = max(self.size - file_string_size, 0)
+
+    def get_checkpoint_size(self, closed: bool) -> int:
+        """Returns imported bytes number, logfile which is still written
+        is imported up to the last finished line.
+        """
+        return self.size if closed else self.complete_size
+
+
+class LogfileLineSplitter:
+    """Incrementally decodes utf-8 chunks and splits them into lines."""
+
+    def __init__(self) -> None:
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._tail = ''
+
+    def feed(self, chunk: bytes) -> list[str]:
+        """Returns complete lines, keeps the unfinished line."""
+        lines = (self._tail + self._decoder.decode(chunk)).split(
+            LOGFILE_LINE_SEPARATOR)
+        self._tail = lines.pop()
+        return lines
+
+    def close(self) -> list[str]:
+        """Returns the last line of the file."""
+        last_line = self._tail + self._decoder.decode(b'', final=True)
+        self._tail = ''
+        return [last_line]
+
+
+def get_lines_from_file(file: BinaryIO) -> Generator[str, None, None]:
+    """Returns Generator with logfile strings read from binary file
+    by LOG_CACHE_READ_SIZE chunks, file is closed at the end.
+    """
+    splitter = LogfileLineSplitter()
+    with file:
+        while chunk := file.read(LOG_CACHE_READ_SIZE):
+            yield from splitter.feed(chunk)
+    yield from splitter.close()
+
+
 def get_unparsed_dirs_from_ftp(ftp: ftplib.FTP) -> list[str]:
-    """Returns unparsed directory list from ftp server"""
-    ftp_directory_list = [
-        dir_name for dir_name in ftp.nlst()
-        if dir_name.isdigit()
+    """Returns unparsed directory list from ftp server,
+    directories with finished import checkpoint are excluded.
+    """
+    ftp_directory_list = sorted(
+        [dir_name for dir_name in ftp.nlst() if dir_name.isdigit()],
+        key=int
+    )
+    if not IngestCheckpoint.objects.exists():
+        return get_unparsed_dirs_by_last_event(ftp_directory_list)
+    processed_directories = get_processed_directories(ftp_directory_list)
+    return [
+        dir_name for dir_name in ftp_directory_list
+        if dir_name not in processed_directories
     ]
-    last_event = Event.objects.order_by('action_time').last()
-    try:
-        last_timestamp = int(datetime.datetime.timestamp(
-            last_event.action_time))
-    except AttributeError:
+
+
+def get_unparsed_dirs_by_last_event(
+        ftp_directory_list: list[str]) -> list[str]:
+    """Returns unparsed directory list by last event time,
+    used once for databases filled before import checkpoints.
+    Directories older than the one holding the last event are marked
+    as processed, the one holding it may have later lines and is
+    read again with newer ones.
+    """
+    last_action_time = Event.objects.aggregate(
+        Max('action_time'))['action_time__max']
+    if not last_action_time:
         ftp_logger.info(f'Last update date not found.')
         return ftp_directory_list
-    else:
-        unparsed_dirs_list = [
-            dir_name for dir_name in ftp_directory_list
-            if int(dir_name) > last_timestamp
-        ]
-        return unparsed_dirs_list[1:]
+    last_timestamp = int(datetime.datetime.timestamp(last_action_time))
+    processed_dirs_list = [
+        dir_name for dir_name in ftp_directory_list
+        if int(dir_name) <= last_timestamp
+    ][:-1]
+    mark_directories_processed(processed_dirs_list)
+    return ftp_directory_list[len(processed_dirs_list):]
+
+
+def get_logfile_name_from_ftp(dir_name: str, ftp: ftplib.FTP) -> str:
+    """Changes directory and returns car logfile name in it.
+    Raises ValueError if there is not exactly one logfile.
+    """
+    ftp.cwd('/' + dir_name)
+    logfiles_list = [
+        filename for filename in ftp.nlst()
+        if filename.find(settings.CAR_LOGFILE_PREFIX) >= 0
+    ]
+    logfile_name, = logfiles_list
+    return logfile_name
+
+
+def get_logfile_cache_key(dir_name: str, logfile_name: str,
+                          ftp: ftplib.FTP) -> LogCacheKey | None:
+    """Returns logfile cache key with logfile size and modification time,
+    or None if LOG_CACHE_DIR is not set.
+    """
+    if not settings.LOG_CACHE_DIR:
+        return None
+    ftp.voidcmd('TYPE I')
+    logfile_size = ftp.size(logfile_name)
+    try:
+        mtime = ftp.voidcmd('MDTM ' + logfile_name).split()[-1]
+    except ftplib.error_perm:
+        mtime = ''
+    return LogCacheKey(dir_name=dir_name, size=logfile_size, mtime=mtime)
 
 
 def get_logfile_from_ftp(dir_name: str, ftp: ftplib.FTP) -> list[str]:
-    """Returns list with car logfile strings from ftp server"""
+    """Returns list with car logfile strings from local cache
+    or ftp server. FTP errors are raised, so directory is not marked
+    as processed.
+    """
     try:
-        ftp.cwd('/' + dir_name)
-        logfiles_list = [
-            filename for filename in ftp.nlst()
-            if filename.find(settings.CAR_LOGFILE_PREFIX) >= 0
-        ]
-        logfile_name, = logfiles_list
-        data = []
-        ftp.retrbinary('RETR ' + logfile_name,
-                       callback=lambda x: data.append(x))
-        logfile = b''.join(data)
+        logfile_name = get_logfile_name_from_ftp(dir_name, ftp)
+        cache_key = get_logfile_cache_key(dir_name, logfile_name, ftp)
+        logfile = read_cached_logfile(cache_key) if cache_key else None
+        if logfile is None:
+            data = []
+            ftp.retrbinary('RETR ' + logfile_name,
+                           callback=lambda x: data.append(x))
+            logfile = b''.join(data)
+            if cache_key:
+                save_logfile_into_cache(cache_key, logfile)
     except ftplib.all_errors as exception:
         ftp_logger.error(f'FTP Error: {exception}.')
-        # raise
+        raise
     except ValueError:
         ftp_logger.warning(f'Log file search error in directory {dir_name}')
     else:
-        return logfile.decode('utf-8').split('\r\n')
+        return logfile.decode('utf-8').split(LOGFILE_LINE_SEPARATOR)
     return []
 
 
-def get_logfiles_generator(ftp: ftplib.FTP) -> Generator[tuple[str, list],
-                                                         None, None]:
-    """Returns Generator with tuples(directory_name, bytes)"""
+def get_logfile_stream_from_ftp(dir_name: str,
+                                ftp: ftplib.FTP) -> Generator[str, None, None]:
+    """Returns Generator with car logfile strings from local cache
+    or ftp server. File is downloaded in background thread and decoded
+    on the fly, so only STREAM_QUEUE_SIZE chunks are kept in memory.
+    FTP errors are raised from the generator.
+    """
+    try:
+        logfile_name = get_logfile_name_from_ftp(dir_name, ftp)
+        cache_key = get_logfile_cache_key(dir_name, logfile_name, ftp)
+    except ftplib.all_errors as exception:
+        ftp_logger.error(f'FTP Error: {exception}.')
+        raise
+    except ValueError:
+        ftp_logger.warning(f'Log file search error in directory {dir_name}')
+        return
+    cached_logfile = open_cached_logfile(cache_key) if cache_key else None
+    if cached_logfile:
+        try:
+            yield from get_lines_from_file(cached_logfile)
+        except LOG_CACHE_READ_ERRORS as exception:
+            remove_broken_cache_entry(cache_key, exception)
+            raise
+        return
+    splitter = LogfileLineSplitter()
+    cache_writer = LogfileCacheWriter(cache_key) if cache_key else None
+    lines_queue = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+    cancelled = threading.Event()
+
+    def put_into_queue(item: list[str] | Exception | None) -> None:
+        while not cancelled.is_set():
+            try:
+                lines_queue.put(item, timeout=STREAM_PUT_TIMEOUT)
+            except queue.Full:
+                continue
+            else:
+                return
+        raise LogfileStreamCancelled
+
+    def feed_chunk(chunk: bytes) -> None:
+        if cache_writer:
+            cache_writer.write(chunk)
+        put_into_queue(splitter.feed(chunk))
+
+    def download() -> None:
+        try:
+            ftp.retrbinary('RETR ' + logfile_name, callback=feed_chunk)
+            put_into_queue(splitter.close())
+        except LogfileStreamCancelled:
+            if cache_writer:
+                cache_writer.discard()
+            return
+        except (*ftplib.all_errors, UnicodeDecodeError) as exception:
+            if cache_writer:
+                cache_writer.discard()
+            put_into_queue(exception)
+        else:
+            if cache_writer:
+                cache_writer.close()
+        put_into_queue(None)
+
+    download_thread = threading.Thread(
+        target=download, name=f'ftp-download-{dir_name}', daemon=True)
+    download_thread.start()
+    try:
+        while (item := lines_queue.get()) is not None:
+            if isinstance(item, Exception):
+                raise item
+            yield from item
+    finally:
+        cancelled.set()
+        download_thread.join()
+
+
+def get_current_directory(ftp: ftplib.FTP) -> str | None:
+    """Returns the latest directory on ftp server,
+    its logfile is still written by the game server.
+    """
+    ftp.cwd('/')
+    return max(
+        [dir_name for dir_name in ftp.nlst() if dir_name.isdigit()],
+        key=int, default=None
+    )
+
+
+def get_directory_list_to_work(ftp: ftplib.FTP) -> list[str]:
+    """Returns unparsed directory list limited by DAYS_LIMIT setting."""
     if settings.DAYS_LIMIT:
         limit_date = timezone.now().date() - datetime.timedelta(
             days=settings.DAYS_LIMIT)
-        directory_list_to_work = [
+        return [
             dir_name_str for dir_name_str in get_unparsed_dirs_from_ftp(ftp)
             if get_date_from_timestamp_str(dir_name_str) > limit_date
         ]
+    return get_unparsed_dirs_from_ftp(ftp)
+
+
+def get_logfile_tail_from_ftp(dir_name: str, ftp: ftplib.FTP, offset: int,
+                              closed: bool) -> tuple[list[str], int]:
+    """Returns car logfile strings written after byte offset and new offset.
+    Only new bytes are downloaded with SIZE and REST commands.
+    Unfinished last line of not closed logfile is left for the next poll,
+    so the new offset is always at the line start.
+    """
+    try:
+        logfile_name = get_logfile_name_from_ftp(dir_name, ftp)
+        ftp.voidcmd('TYPE I')
+        logfile_size = ftp.size(logfile_name)
+        if logfile_size < offset:
+            ftp_logger.warning(
+                f'Log file in directory {dir_name} is truncated, '
+                f'reading from the start.')
+            offset = 0
+        if logfile_size == offset:
+            return [], offset
+        data = []
+        ftp.retrbinary('RETR ' + logfile_name,
+                       callback=lambda x: data.append(x), rest=offset)
+    except ftplib.all_errors as exception:
+        ftp_logger.error(f'FTP Error: {exception}.')
+        raise
+    except ValueError:
+        ftp_logger.warning(f'Log file search error in directory {dir_name}')
+        return [], offset
+    logfile_tail = b''.join(data)
+    if not closed:
+        separator = LOGFILE_LINE_SEPARATOR.encode()
+        last_line_end = logfile_tail.rfind(separator)
+        if last_line_end < 0:
+            return [], offset
+        logfile_tail = logfile_tail[:last_line_end + len(separator)]
+    file_strings = logfile_tail.decode('utf-8').split(LOGFILE_LINE_SEPARATOR)
+    return file_strings, offset + len(logfile_tail)
+
+
+def get_logfile_tail_data_generator(
+        ftp: ftplib.FTP, directory_list_to_work: list[str],
+        current_directory: str) -> Generator[ParsedLogfile, None, None]:
+    """Returns Generator with ParsedLogfile for logfile parts
+    written after the last imported byte offset. Logfile in the
+    current directory is left open for the next poll.
+    """
+    checkpoints = get_ingest_checkpoints(directory_list_to_work)
+    for dir_name in directory_list_to_work:
+        checkpoint = checkpoints.get(dir_name)
+        if checkpoint and checkpoint.status in (
+                IngestCheckpoint.CheckpointStatus.PARTIAL,
+                IngestCheckpoint.CheckpointStatus.FAILED):
+            offset = checkpoint.byte_offset
+        else:
+            offset = 0
+        closed = dir_name != current_directory
+        file_strings, new_offset = get_logfile_tail_from_ftp(
+            dir_name, ftp, offset, closed)
+        yield ParsedLogfile(
+            dir_name=dir_name, size=new_offset,
+            logfile_data=defenition_logfile_data(dir_name, file_strings),
+            continued=offset > 0, closed=closed)
+
+
+def get_logfiles_generator(
+        ftp: ftplib.FTP, directory_list_to_work: list[str]
+        ) -> Generator[tuple[str, Iterable[str]], None, None]:
+    """Returns Generator with tuples(directory_name, logfile strings).
+    Logfile strings are streamed if FTP_STREAMING_MODE is enabled.
+    """
+    if settings.FTP_STREAMING_MODE:
+        get_logfile = get_logfile_stream_from_ftp
     else:
-        directory_list_to_work = get_unparsed_dirs_from_ftp(ftp)
+        get_logfile = get_logfile_from_ftp
     logfiles = (
-        (dir_name, get_logfile_from_ftp(dir_name, ftp))
+        (dir_name, get_logfile(dir_name, ftp))
         for dir_name in directory_list_to_work
     )
     return logfiles
 
 
+def get_ftp_connection() -> ftplib.FTP:
+    """Returns logged in ftp connection."""
+    ftp = ftplib.FTP(settings.FTP_HOST)
+    try:
+        ftp.login(settings.FTP_LOGIN, settings.FTP_PASSWORD)
+    except ftplib.all_errors:
+        ftp.close()
+        raise
+    return ftp
+
+
+def get_logfile_data_generator(
+        ftp: ftplib.FTP, directory_list_to_work: list[str],
+        current_directory: str | None = None
+        ) -> Generator[ParsedLogfile, None, None]:
+    """Returns Generator with ParsedLogfile, one directory at a time.
+    Logfile in the current directory is left open for the next ingest.
+    """
+    for dir_name, file_strings in get_logfiles_generator(
+            ftp, directory_list_to_work):
+        closed = dir_name != current_directory
+        logfile_lines = LogfileLines(file_strings)
+        logfile_data = defenition_logfile_data(dir_name, logfile_lines)
+        yield ParsedLogfile(
+            dir_name=dir_name, size=logfile_lines.get_checkpoint_size(closed),
+            logfile_data=logfile_data, closed=closed)
+
+
+def get_parsed_logfile(dir_name: str, size: int, parse_future: Future,
+                       closed: bool = True) -> ParsedLogfile:
+    """Returns ParsedLogfile with result of parse process."""
+    return ParsedLogfile(dir_name=dir_name, size=size,
+                         logfile_data=parse_future.result(), closed=closed)
+
+
+def get_parallel_logfile_data_generator(
+        directory_list_to_work: list[str],
+        current_directory: str | None = None
+        ) -> Generator[ParsedLogfile, None, None]:
+    """Returns Generator with ParsedLogfile in directory order.
+    Logfiles are downloaded by INGEST_DOWNLOAD_WORKERS ftp connections
+    and parsed by INGEST_PARSE_WORKERS processes. Downloads are submitted
+    lazily, so no more than INGEST_DOWNLOAD_WORKERS + INGEST_PARSE_WORKERS
+    logfiles are kept in memory while the importer catches up.
+    Logfile in the current directory is left open for the next ingest.
+    """
+    thread_data = threading.local()
+    ftp_connections = []
+    window_size = (settings.INGEST_DOWNLOAD_WORKERS
+                   + settings.INGEST_PARSE_WORKERS)
+    directories = iter(directory_list_to_work)
+    download_futures = deque()
+    parse_futures = deque()
+
+    def download_logfile(dir_name: str) -> tuple[list[str], int]:
+        ftp = getattr(thread_data, 'ftp', None)
+        if ftp is None:
+            ftp = get_ftp_connection()
+            thread_data.ftp = ftp
+            ftp_connections.append(ftp)
+        file_strings = get_logfile_from_ftp(dir_name, ftp)
+        logfile_lines = LogfileLines(file_strings)
+        for _ in logfile_lines:
+            pass
+        return file_strings, logfile_lines.get_checkpoint_size(
+            dir_name != current_directory)
+
+    def submit_downloads() -> None:
+        while len(download_futures) + len(parse_futures) < window_size:
+            dir_name = next(directories, None)
+            if dir_name is None:
+                return
+            download_futures.append(
+                (dir_name, download_pool.submit(download_logfile, dir_name)))
+
+    download_pool = ThreadPoolExecutor(
+        max_workers=settings.INGEST_DOWNLOAD_WORKERS,
+        thread_name_prefix='ftp-download')
+    parse_pool = ProcessPoolExecutor(
+        max_workers=settings.INGEST_PARSE_WORKERS)
+    try:
+        submit_downloads()
+        while download_futures:
+            dir_name, download_future = download_futures.popleft()
+            file_strings, size = download_future.result()
+            parse_futures.append((dir_name, size, parse_pool.submit(
+                defenition_logfile_data, dir_name, file_strings),
+                dir_name != current_directory))
+            if len(parse_futures) > settings.INGEST_PARSE_WORKERS:
+                parsed_logfile = get_parsed_logfile(*parse_futures.popleft())
+                submit_downloads()
+                yield parsed_logfile
+            submit_downloads()
+        while parse_futures:
+            yield get_parsed_logfile(*parse_futures.popleft())
+    finally:
+        download_pool.shutdown(cancel_futures=True)
+        parse_pool.shutdown(cancel_futures=True)
+        for ftp in ftp_connections:
+            ftp.close()
+
+
 def get_summary_result(common_result: RecordsStatus,
                        current_result: RecordsStatus) -> None:
-    """Summarizes class attributes RecordStatus."""
+    """Summarizes class attributes RecordStatus, times are rounded
+    to milliseconds.
+    """
     for attr in common_result.__dict__.keys():
-        common_result_attr = getattr(common_result, attr)
-        setattr(common_result, attr,
-                common_result_attr + getattr(current_result, attr))
+        attr_sum = (getattr(common_result, attr) +
+                    getattr(current_result, attr))
+        if isinstance(attr_sum, float):
+            attr_sum = round(attr_sum, 3)
+        setattr(common_result, attr, attr_sum)
+
+
+def import_parsed_logfiles(
+        parsed_logfiles: Iterable[ParsedLogfile], days_limit: int = 0
+        ) -> Generator[tuple[ParsedLogfile, RecordsStatus], None, None]:
+    """Imports parsed logfiles into db one at a time with their import
+    checkpoints, returns Generator with import result of each logfile.
+    """
+    for parsed_logfile in parsed_logfiles:
+        if parsed_logfile.closed:
+            checkpoint_status = IngestCheckpoint.CheckpointStatus.DONE
+        else:
+            checkpoint_status = IngestCheckpoint.CheckpointStatus.PARTIAL
+        try:
+            with transaction.atomic():
+                current_result = import_logfile_data_into_db(
+                    parsed_logfile.logfile_data, days_limit,
+                    parsed_logfile.continued)
+                save_ingest_checkpoint(parsed_logfile.dir_name,
+                                       parsed_logfile.size,
+                                       checkpoint_status)
+        except Exception:
+            mark_ingest_checkpoint_failed(parsed_logfile.dir_name)
+            raise
+        yield parsed_logfile, current_result
 
 
-def get_updates_from_ftp() -> RecordsStatus:
-    """Get logfiles data from ftp server."""
+def get_updates_from_ftp(
+        progress_callback: Callable[[int, int], None] | None = None
+        ) -> RecordsStatus:
+    """Get logfiles data from ftp server.
+    progress_callback is called with numbers of processed and total
+    directories. FTP errors are logged and raised, so the ingest job
+    is saved as failed.
+    """
     ftp = ftplib.FTP(settings.FTP_HOST)
     log_list = []
     result = RecordsStatus()
@@ -99,15 +539,33 @@ def get_updates_from_ftp() -> RecordsStatus:
     try:
         ftp.connect()
         ftp.login(settings.FTP_LOGIN, settings.FTP_PASSWORD)
-        for dir_name, file_strings in get_logfiles_generator(ftp):
-            logfile_data = defenition_logfile_data(dir_name, file_strings)
-            current_result = import_logfile_data_into_db(logfile_data,
-                                                         settings.DAYS_LIMIT)
+        directory_list_to_work = get_directory_list_to_work(ftp)
+        current_directory = get_current_directory(ftp)
+        if settings.FTP_TAIL_MODE and directory_list_to_work:
+            logfile_data_generator = get_logfile_tail_data_generator(
+                ftp, directory_list_to_work, current_directory)
+        elif (len(directory_list_to_work) > 1 and
+                max(settings.INGEST_DOWNLOAD_WORKERS,
+                    settings.INGEST_PARSE_WORKERS) > 1):
+            ftp_logger.info(
+                f'Parallel ingest of {len(directory_list_to_work)} '
+                f'directories.')
+            logfile_data_generator = get_parallel_logfile_data_generator(
+                directory_list_to_work, current_directory)
+        else:
+            logfile_data_generator = get_logfile_data_generator(
+                ftp, directory_list_to_work, current_directory)
+        if progress_callback:
+            progress_callback(0, len(directory_list_to_work))
+        for number, (_, current_result) in enumerate(import_parsed_logfiles(
+                logfile_data_generator, settings.DAYS_LIMIT), 1):
             get_summary_result(result, current_result)
+            if progress_callback:
+                progress_callback(number, len(directory_list_to_work))
         change_status_for_phantoms()
     except ftplib.all_errors as exception:
         ftp_logger.error(f'FTP Error: {exception}.')
-        # raise
+        raise
     finally:
         ftp.close()
     result.elapsed_time = round(time.monotonic() - start_time, 3)
@@ -0,0 +1,130 @@
+import dataclasses
+import fcntl
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Generator
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from dzllogparser.models import IngestJob
+from dzllogparser.services.ftp import get_updates_from_ftp
+from dzllogparser.services.stats import reconcile_dataset_stats_if_expired
+
+
+ingest_logger = logging.getLogger(__name__)
+
+
+ACTIVE_JOB_STATUSES = (IngestJob.JobStatus.QUEUED,
+                       IngestJob.JobStatus.RUNNING)
+QUEUED_JOB_TIMEOUT = timezone.timedelta(minutes=10)
+
+ingest_worker = ThreadPoolExecutor(max_workers=1,
+                                   thread_name_prefix='ingest-worker')
+
+
+class IngestAlreadyRunning(Exception):
+    """Raised when ingest lock is held by another run."""
+
+
+@contextmanager
+def ingest_lock() -> Generator[None, None, None]:
+    """Holds exclusive ingest file lock, shared by web workers
+    and management commands. Raises IngestAlreadyRunning if it is taken.
+    """
+    with open(settings.INGEST_LOCK_FILE, 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise IngestAlreadyRunning
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def is_ingest_running() -> bool:
+    """Returns True if ingest lock is held by another run."""
+    try:
+        with ingest_lock():
+            return False
+    except IngestAlreadyRunning:
+        return True
+
+
+def create_ingest_job() -> IngestJob | None:
+    """Returns new queued ingest job, or None if ingest is running.
+    Running jobs left by interrupted runs are marked as failed, as well as
+    queued jobs not taken by worker for QUEUED_JOB_TIMEOUT.
+    """
+    if is_ingest_running():
+        return None
+    IngestJob.objects.filter(
+        Q(status=IngestJob.JobStatus.RUNNING) |
+        Q(status=IngestJob.JobStatus.QUEUED,
+          created_time__lt=timezone.now() - QUEUED_JOB_TIMEOUT)
+    ).update(status=IngestJob.JobStatus.FAILED, error='Interrupted.',
+             finished_time=timezone.now())
+    return IngestJob.objects.create()
+
+
+def enqueue_ingest_job() -> IngestJob:
+    """Submits new ingest job to in-process worker and returns it.
+    If ingest is already running, returns the running job.
+    """
+    job = create_ingest_job()
+    if job is None:
+        running_job = IngestJob.objects.filter(
+            status__in=ACTIVE_JOB_STATUSES).order_by('-pk').first()
+        if running_job:
+            return running_job
+        job = IngestJob.objects.create()
+    ingest_worker.submit(run_ingest_job_in_worker, job.pk)
+    return job
+
+
+def run_ingest_job_in_worker(job_id: int) -> None:
+    """Runs ingest job and closes worker thread db connection."""
+    try:
+        run_ingest_job(job_id)
+    finally:
+        connection.close()
+
+
+def run_ingest_job(job_id: int) -> IngestJob:
+    """Runs queued ingest job under ingest lock and saves its result."""
+    job = IngestJob.objects.get(pk=job_id)
+
+    def save_progress(directories_done: int, directories_total: int) -> None:
+        IngestJob.objects.filter(pk=job_id).update(
+            directories_done=directories_done,
+            directories_total=directories_total)
+
+    try:
+        with ingest_lock():
+            job.refresh_from_db()
+            if job.status != IngestJob.JobStatus.QUEUED:
+                return job
+            job.status = IngestJob.JobStatus.RUNNING
+            job.started_time = timezone.now()
+            job.save(update_fields=['status', 'started_time'])
+            records_status = get_updates_from_ftp(
+                progress_callback=save_progress)
+            reconcile_dataset_stats_if_expired()
+    except IngestAlreadyRunning:
+        job.status = IngestJob.JobStatus.FAILED
+        job.error = 'Another ingest is running.'
+    except Exception as exception:
+        ingest_logger.exception(f'Ingest job {job_id} failed.')
+        job.status = IngestJob.JobStatus.FAILED
+        job.error = str(exception)
+    else:
+        job.status = IngestJob.JobStatus.DONE
+        job.result = dataclasses.asdict(records_status)
+    job.refresh_from_db(fields=['directories_done', 'directories_total'])
+    job.finished_time = timezone.now()
+    job.save()
+    return job
@@ -0,0 +1,176 @@
+import glob
+import gzip
+import logging
+import os
+import tempfile
+import zlib
+
+from typing import BinaryIO, NamedTuple
+
+from django.conf import settings
+
+
+logcache_logger = logging.getLogger(__name__)
+
+LOG_CACHE_FILE_SUFFIX = '.log.gz'
+LOG_CACHE_COMPRESS_LEVEL = 6
+LOG_CACHE_READ_SIZE = 64 * 1024
+LOG_CACHE_READ_ERRORS = (OSError, EOFError, zlib.error)
+
+
+class LogCacheKey(NamedTuple):
+    dir_name: str
+    size: int
+    mtime: str
+
+
+class LogCacheEntry(NamedTuple):
+    path: str
+    size: int
+    used_time: float
+
+
+def get_cache_path(key: LogCacheKey) -> str:
+    """Returns cache file path for logfile key."""
+    return os.path.join(
+        settings.LOG_CACHE_DIR,
+        f'{key.dir_name}-{key.size}-{key.mtime}{LOG_CACHE_FILE_SUFFIX}')
+
+
+def get_cache_entries(dir_name: str = '') -> list[LogCacheEntry]:
+    """Returns cache entries of directory or all of them,
+    least recently used first.
+    """
+    pattern = f'{dir_name}-*' if dir_name else '*'
+    entries = []
+    for path in glob.glob(os.path.join(
+            settings.LOG_CACHE_DIR, pattern + LOG_CACHE_FILE_SUFFIX)):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append(LogCacheEntry(path=path, size=stat.st_size,
+                                     used_time=stat.st_mtime))
+    return sorted(entries, key=lambda entry: entry.used_time)
+
+
+def remove_cache_entry(path: str) -> None:
+    """Removes cache file, which may be already removed by other process."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def evict_log_cache() -> int:
+    """Removes least recently used entries while cache is bigger than
+    LOG_CACHE_MAX_SIZE megabytes, returns number of removed entries.
+    """
+    entries = get_cache_entries()
+    cache_size = sum(entry.size for entry in entries)
+    max_cache_size = settings.LOG_CACHE_MAX_SIZE * 1024 * 1024
+    removed_entries = 0
+    for entry in entries:
+        if cache_size <= max_cache_size:
+            break
+        remove_cache_entry(entry.path)
+        cache_size -= entry.size
+        removed_entries += 1
+    return removed_entries
+
+
+def open_cached_logfile(key: LogCacheKey) -> BinaryIO | None:
+    """Returns decompressing file object of cached logfile,
+    or None if it is not cached. Used time of entry is updated.
+    """
+    path = get_cache_path(key)
+    try:
+        os.utime(path)
+        return gzip.open(path, 'rb')
+    except FileNotFoundError:
+        return None
+
+
+def remove_broken_cache_entry(key: LogCacheKey, exception: Exception) -> None:
+    """Removes cache entry which can not be decompressed,
+    so the logfile is downloaded again.
+    """
+    logcache_logger.warning(
+        f'Cached logfile {key.dir_name} is broken: {exception}.')
+    remove_cache_entry(get_cache_path(key))
+
+
+def read_cached_logfile(key: LogCacheKey) -> bytes | None:
+    """Returns cached logfile content or None if it is not cached."""
+    cached_logfile = open_cached_logfile(key)
+    if cached_logfile is None:
+        return None
+    with cached_logfile:
+        try:
+            return cached_logfile.read()
+        except LOG_CACHE_READ_ERRORS as exception:
+            remove_broken_cache_entry(key, exception)
+    return None
+
+
+class LogfileCacheWriter:
+    """Compresses logfile chunks into temporary file, which replaces
+    cache entries of the same directory only after close. Cache write
+    errors are logged and do not interrupt logfile download.
+    """
+
+    def __init__(self, key: LogCacheKey) -> None:
+        self.key = key
+        try:
+            os.makedirs(settings.LOG_CACHE_DIR, exist_ok=True)
+            self.file = tempfile.NamedTemporaryFile(
+                dir=settings.LOG_CACHE_DIR, suffix='.tmp', delete=False)
+            self.gzip_file = gzip.GzipFile(
+                fileobj=self.file, mode='wb',
+                compresslevel=LOG_CACHE_COMPRESS_LEVEL)
+        except OSError as exception:
+            self.file = None
+            self.fail(exception)
+
+    def fail(self, exception: OSError) -> None:
+        logcache_logger.warning(
+            f'Logfile {self.key.dir_name} is not cached: {exception}.')
+        self.discard()
+
+    def write(self, chunk: bytes) -> None:
+        if self.file is None:
+            return
+        try:
+            self.gzip_file.write(chunk)
+        except OSError as exception:
+            self.fail(exception)
+
+    def close(self) -> None:
+        if self.file is None:
+            return
+        try:
+            self.gzip_file.close()
+            self.file.close()
+            for entry in get_cache_entries(self.key.dir_name):
+                remove_cache_entry(entry.path)
+            os.replace(self.file.name, get_cache_path(self.key))
+        except OSError as exception:
+            self.fail(exception)
+            return
+        self.file = None
+        evict_log_cache()
+
+    def discard(self) -> None:
+        if self.file is None:
+            return
+        self.gzip_file.close()
+        self.file.close()
+        remove_cache_entry(self.file.name)
+        self.file = None
+
+
+def save_logfile_into_cache(key: LogCacheKey, logfile: bytes) -> None:
+    """Saves downloaded logfile into cache."""
+    cache_writer = LogfileCacheWriter(key)
+    cache_writer.write(logfile)
+    cache_writer.close()
@@ -0,0 +1,276 @@
+import abc
+import gzip
+import logging
+import os
+import tarfile
+import time
+import zipfile
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import BinaryIO, Callable, Generator, Iterable
+
+from django.conf import settings
+
+from dzllogparser.services.db import (RecordsStatus,
+                                      change_status_for_phantoms,
+                                      get_processed_directories)
+from dzllogparser.services.ftp import (LogfileLines, ParsedLogfile,
+                                       get_current_directory,
+                                       get_ftp_connection,
+                                       get_lines_from_file,
+                                       get_logfile_from_ftp,
+                                       get_logfile_stream_from_ftp,
+                                       get_parsed_logfile,
+                                       get_summary_result,
+                                       import_parsed_logfiles)
+from dzllogparser.services.parser import defenition_logfile_data
+
+
+logsource_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReplayProgress:
+    directories_total: int
+    directories_done: int = 0
+    dir_name: str = ''
+    bytes_read: int = 0
+    events_created: int = 0
+    elapsed_time: float = 0.0
+
+
+def get_sorted_directories(names: Iterable[str]) -> list[str]:
+    """Returns logfile directory names sorted by their timestamps."""
+    return sorted([name for name in names if name.isdigit()], key=int)
+
+
+def is_logfile_name(filename: str) -> bool:
+    """Returns True for car logfile name."""
+    return filename.find(settings.CAR_LOGFILE_PREFIX) >= 0
+
+
+class LogfileGzipFile(gzip.GzipFile):
+    """GzipFile which closes decompressed file object too."""
+
+    def __init__(self, file: BinaryIO) -> None:
+        super().__init__(fileobj=file, mode='rb')
+        self.raw_file = file
+
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            self.raw_file.close()
+
+
+def open_logfile(file: BinaryIO, filename: str) -> BinaryIO:
+    """Returns file object decompressing gzipped logfile,
+    closing it closes the logfile.
+    """
+    if filename.endswith('.gz'):
+        return LogfileGzipFile(file)
+    return file
+
+
+class LogSource(abc.ABC):
+    """Source of car logfiles stored in timestamp named directories."""
+
+    @abc.abstractmethod
+    def get_directories(self) -> list[str]:
+        """Returns directory names in timestamp order."""
+
+    def get_current_directory(self) -> str | None:
+        """Returns directory which logfile is still written,
+        local copies have no such directory.
+        """
+        return None
+
+    @abc.abstractmethod
+    def get_logfile_lines(self, dir_name: str) -> Iterable[str]:
+        """Returns car logfile strings of directory."""
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> 'LogSource':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class FtpLogSource(LogSource):
+    """Reads logfiles from game ftp server through local logfile cache."""
+
+    def __init__(self) -> None:
+        self.ftp = get_ftp_connection()
+
+    def get_directories(self) -> list[str]:
+        self.ftp.cwd('/')
+        return get_sorted_directories(self.ftp.nlst())
+
+    def get_current_directory(self) -> str | None:
+        return get_current_directory(self.ftp)
+
+    def get_logfile_lines(self, dir_name: str) -> Iterable[str]:
+        if settings.FTP_STREAMING_MODE:
+            return get_logfile_stream_from_ftp(dir_name, self.ftp)
+        return get_logfile_from_ftp(dir_name, self.ftp)
+
+    def close(self) -> None:
+        self.ftp.close()
+
+
+class DirectoryLogSource(LogSource):
+    """Reads logfiles from local copy of ftp server directories,
+    logfiles may be gzipped.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def get_directories(self) -> list[str]:
+        return get_sorted_directories(
+            name for name in os.listdir(self.path)
+            if os.path.isdir(os.path.join(self.path, name))
+        )
+
+    def get_logfile_lines(self, dir_name: str) -> Iterable[str]:
+        dir_path = os.path.join(self.path, dir_name)
+        logfile_names = [
+            filename for filename in os.listdir(dir_path)
+            if is_logfile_name(filename)
+        ]
+        if len(logfile_names) != 1:
+            logsource_logger.warning(
+                f'Log file search error in directory {dir_name}')
+            return []
+        logfile_name, = logfile_names
+        logfile = open(os.path.join(dir_path, logfile_name), 'rb')
+        return get_lines_from_file(open_logfile(logfile, logfile_name))
+
+
+class ArchiveLogSource(LogSource):
+    """Reads logfiles from tar or zip archive of ftp server directories,
+    directory is the nearest parent of logfile in archive.
+    """
+
+    def __init__(self, path: str) -> None:
+        if zipfile.is_zipfile(path):
+            self.archive = zipfile.ZipFile(path)
+            members = self.archive.namelist()
+            self.open_member = self.archive.open
+        elif tarfile.is_tarfile(path):
+            self.archive = tarfile.open(path, 'r:*')
+            members = [member.name for member in self.archive.getmembers()
+                       if member.isfile()]
+            self.open_member = self.archive.extractfile
+        else:
+            raise ValueError(f'{path} is not a tar or zip archive.')
+        self.logfiles = dict()
+        for member in members:
+            dir_name, filename = os.path.split(member.rstrip('/'))
+            dir_name = os.path.basename(dir_name)
+            if dir_name.isdigit() and is_logfile_name(filename):
+                self.logfiles.setdefault(dir_name, []).append(member)
+
+    def get_directories(self) -> list[str]:
+        return get_sorted_directories(self.logfiles)
+
+    def get_logfile_lines(self, dir_name: str) -> Iterable[str]:
+        members = self.logfiles.get(dir_name, [])
+        if len(members) != 1:
+            logsource_logger.warning(
+                f'Log file search error in directory {dir_name}')
+            return []
+        member, = members
+        return get_lines_from_file(
+            open_logfile(self.open_member(member), member))
+
+    def close(self) -> None:
+        self.archive.close()
+
+
+def get_log_source(path: str | None = None) -> LogSource:
+    """Returns log source for local directory or archive path,
+    or for ftp server if path is not set.
+    """
+    if not path:
+        return FtpLogSource()
+    if os.path.isdir(path):
+        return DirectoryLogSource(path)
+    return ArchiveLogSource(path)
+
+
+def get_source_logfile_data_generator(
+        source: LogSource, directories: list[str], parse_workers: int = 1
+        ) -> Generator[ParsedLogfile, None, None]:
+    """Returns Generator with ParsedLogfile in directory order.
+    With several parse_workers logfiles are parsed in processes
+    while previous ones are imported.
+    """
+    current_directory = source.get_current_directory()
+    if parse_workers <= 1:
+        for dir_name in directories:
+            closed = dir_name != current_directory
+            logfile_lines = LogfileLines(source.get_logfile_lines(dir_name))
+            logfile_data = defenition_logfile_data(dir_name, logfile_lines)
+            yield ParsedLogfile(
+                dir_name=dir_name,
+                size=logfile_lines.get_checkpoint_size(closed),
+                logfile_data=logfile_data, closed=closed)
+        return
+    parse_pool = ProcessPoolExecutor(max_workers=parse_workers)
+    try:
+        parse_futures = deque()
+        for dir_name in directories:
+            closed = dir_name != current_directory
+            logfile_lines = LogfileLines(source.get_logfile_lines(dir_name))
+            file_strings = list(logfile_lines)
+            parse_futures.append((dir_name,
+                                  logfile_lines.get_checkpoint_size(closed),
+                                  parse_pool.submit(defenition_logfile_data,
+                                                    dir_name, file_strings),
+                                  closed))
+            if len(parse_futures) > parse_workers:
+                yield get_parsed_logfile(*parse_futures.popleft())
+        while parse_futures:
+            yield get_parsed_logfile(*parse_futures.popleft())
+    finally:
+        parse_pool.shutdown(cancel_futures=True)
+
+
+def replay_logs(
+        source: LogSource, days_limit: int = 0, parse_workers: int = 1,
+        progress_callback: Callable[[ReplayProgress], None] | None = None,
+        force: bool = False) -> RecordsStatus:
+    """Imports logfiles of source into db with import checkpoints,
+    directories with finished checkpoint are skipped. With force all
+    directories are imported again to rebuild db: events imported before
+    are skipped, but cars and players get state of the replayed logfiles,
+    so source has to contain the latest directories.
+    """
+    start_time = time.monotonic()
+    result = RecordsStatus()
+    directories = source.get_directories()
+    if not force:
+        processed_directories = get_processed_directories(directories)
+        directories = [dir_name for dir_name in directories
+                       if dir_name not in processed_directories]
+    progress = ReplayProgress(directories_total=len(directories))
+    for parsed_logfile, current_result in import_parsed_logfiles(
+            get_source_logfile_data_generator(
+                source, directories, parse_workers), days_limit):
+        get_summary_result(result, current_result)
+        progress.directories_done += 1
+        progress.dir_name = parsed_logfile.dir_name
+        progress.bytes_read += parsed_logfile.size
+        progress.events_created = result.events_created
+        progress.elapsed_time = time.monotonic() - start_time
+        if progress_callback:
+            progress_callback(progress)
+    change_status_for_phantoms()
+    result.elapsed_time = round(time.monotonic() - start_time, 3)
+    return result
@@ -1,10 +1,12 @@
 import datetime
 import logging
 import re
+import sys
 
-from typing import NamedTuple
+from typing import Iterable, NamedTuple
 from dataclasses import dataclass
 from enum import Enum
+from functools import lru_cache
 
 
 parser_logger = logging.getLogger(__name__)
@@ -12,6 +14,8 @@ parser_logger = logging.getLogger(__name__)
 
 INIT_TYPE_STR_TRIGGER = 'initialized.'
 DELETE_TYPE_STR_TRIGGER = 'DELETED.'
+ACTION_TIMEZONE = datetime.timezone(offset=datetime.timedelta(hours=3))
+ACTION_TIME_CACHE_SIZE = 2 * 24 * 60 * 60
 
 
 @dataclass
@@ -30,6 +34,7 @@ class Player:
     steam_id: str
     name: str
     alter_names: set
+    names_seen: dict
 
 
 class EventType(Enum):
@@ -53,37 +58,53 @@ class LogfileData(NamedTuple):
     events: list
 
 
-def get_player_data(log_string: str) -> Player:
-    """Returns Player dataclass with parsed data."""
-    player_data_string = re.search(
-        r'Player\{.*\.\d{6}\}\s', log_string).group(0)
-    steam_id = re.search(r'(?<=steam:)[0-9]{17}', player_data_string).group(0)
-    name = re.search(r'(?<=name:)(.*)(?=\ssteam:)',
-                     player_data_string).group(0)
-    return Player(
-        steam_id=steam_id,
-        name=name,
-        alter_names=set()
+LOG_STRING_PATTERN = re.compile(
+    r'^(?P<time>(?:[0-1]?[0-9]|2[0-3]):[0-5]?[0-9]:[0-5]?[0-9])'
+    r'(?:.*?Player\{name:(?P<player_name>.*?)\ssteam:(?P<steam_id>[0-9]{17})'
+    r'[^}]*\.\d{6}\}\s(?P<action>.*?)\s(?=car:<))?'
+    r'.*?car:<name=\((?P<car_name>.*?)\)\stype=(?P<car_type>.*?)'
+    r'\sid=(?P<car_id>\d*)'
+    r'.*?pos=(?P<position>(?:\d*\.\d{6}\s){3})'
+    r'.*?status=\[(?P<status>[^\]]*)\].*>'
+)
+
+
+class LogString(NamedTuple):
+    time: str
+    player: Player | None
+    action: str | None
+    car: Car
+
+
+def get_log_string_data(log_string: str) -> LogString | None:
+    """Returns LogString with time, player, action and car data parsed
+    in a single pass, or None if the string does not match.
+    """
+    match = LOG_STRING_PATTERN.match(log_string)
+    if not match:
+        return None
+    (time_str, player_name, steam_id, action, car_name, car_type, car_id,
+     position_str, status) = match.groups()
+    if steam_id:
+        player = Player(steam_id=steam_id, name=player_name,
+                        alter_names=set(), names_seen=dict())
+    else:
+        player = None
+    position = ', '.join(
+        position[:-3] for position in position_str.split()
     )
+    car = Car(car_id=car_id, name=car_name, car_type=car_type,
+              position=position, status=status, last_init_time=None,
+              deletion_time=None, last_use_time=None)
+    if action:
+        action = sys.intern(action)
+    return LogString(time=time_str, player=player, action=action, car=car)
 
 
-def get_car_data(log_string: str) -> Car:
-    """Returns Car dataclass with parsed data."""
-    car_data_string = re.search(r'car:<.*>', log_string).group(0)
-    name = re.search(
-        r'(?<=\<name=\()(.*)(?=\)\stype=)', car_data_string).group(0)
-    car_type = re.search(r'(?<=type=)(.*)(?=\sid=)', car_data_string).group(0)
-    car_id = re.search(r'(?<=id=)\d*', car_data_string).group(0)
-    position_list = re.search(r'(?<=pos=)(\d*\.\d{6}\s){3}',
-                              car_data_string).group(0).rstrip().split()
-    rounded_position_list = [
-        position[:-3] for position in position_list
-    ]
-    position = ', '.join(rounded_position_list)
-    status = re.search(r'(?<=status=\[).*(?=\])', car_data_string).group(0)
-    return Car(car_id=car_id, name=name, car_type=car_type, position=position,
-               status=status, last_init_time=None, deletion_time=None,
-               last_use_time=None)
+def get_position_coordinates(position: str) -> tuple[float, float, float]:
+    """Returns x, y, z coordinates from position string"""
+    position_x, position_y, position_z = map(float, position.split(', '))
+    return position_x, position_y, position_z
 
 
 def get_date_from_timestamp_str(timestamp: str) -> datetime.date:
@@ -93,43 +114,38 @@ def get_date_from_timestamp_str(timestamp: str) -> datetime.date:
     return current_date
 
 
-def get_action_time(directory_name: str,
-                           action_str: str) -> datetime.datetime:
-    """Returns Action time from timestamp and parsed time."""
-    current_date = get_date_from_timestamp_str(directory_name)
-    current_time_string = re.match(
-        r'^([0-1]?[0-9]|2[0-3]):[0-5]?[0-9]:[0-5]?[0-9]', action_str).group(0)
-    action_time = datetime.datetime.strptime(
-        current_time_string, '%H:%M:%S').time()
-    return datetime.datetime.combine(
-        current_date, action_time, tzinfo=datetime.timezone(
-            offset=datetime.timedelta(hours=3))
+@lru_cache(maxsize=ACTION_TIME_CACHE_SIZE)
+def get_action_time(current_date: datetime.date,
+                    time_str: str) -> datetime.datetime:
+    """Returns Action time from directory date and parsed time.
+    Results are cached, there are only 86400 possible times per date.
+    """
+    hours, minutes, seconds = time_str.split(':')
+    return datetime.datetime(
+        current_date.year, current_date.month, current_date.day,
+        int(hours), int(minutes), int(seconds), tzinfo=ACTION_TIMEZONE
     )
 
 
-def get_action_str(log_string: str) -> str:
-    """Returns parsed action text."""
-    action_str = re.search(r'(?<=\.\d{6}\}\s)(.*)(?=\scar:)',
-                           log_string).group(0)
-    return action_str
-
-
-def defenition_logfile_data(dir_name: str, file_strings: list) -> LogfileData:
+def defenition_logfile_data(dir_name: str,
+                            file_strings: Iterable[str]) -> LogfileData:
     """Parsed data from file strings and returns LogfileData models
     with cars, players and events.
     """
     players = dict()
     cars = dict()
     events = []
+    current_date = get_date_from_timestamp_str(dir_name)
     for number, file_string in enumerate(file_strings):
         log_string = file_string.strip()
-        player = None
-        try:
-            car = get_car_data(log_string)
-            action_time = get_action_time(dir_name, log_string)
-        except AttributeError:
+        log_string_data = get_log_string_data(log_string)
+        if not log_string_data:
             parser_logger.info(f'Line {number} is skipped.')
             continue
+        player = None
+        car = log_string_data.car
+        action_time = get_action_time(current_date,
+                                      log_string_data.time)
         exists_record = cars.get(car.car_id)
         if exists_record:
             car.last_init_time = exists_record.last_init_time
@@ -142,17 +158,24 @@ def defenition_logfile_data(dir_name: str, file_strings: list) -> LogfileData:
             action=DELETE_TYPE_STR_TRIGGER
             car.deletion_time = action_time
             car.status = 'DELETED'
-        else:
-            player = get_player_data(log_string)
+        elif log_string_data.player:
+            player = log_string_data.player
             db_player = players.get(player.steam_id)
-            if (db_player and db_player.name != player.name):
-                db_player.alter_names.add(db_player.name)
-                db_player.name = player.name
+            if db_player:
+                if db_player.name != player.name:
+                    db_player.alter_names.add(db_player.name)
+                    db_player.name = player.name
                 player = db_player
             players.update({player.steam_id: player})
+            first_seen, _ = player.names_seen.get(
+                player.name, (action_time, action_time))
+            player.names_seen[player.name] = (first_seen, action_time)
             event_type = EventType.ACTION
-            action = get_action_str(log_string)
+            action = log_string_data.action
             car.last_use_time = action_time
+        else:
+            parser_logger.info(f'Line {number} is skipped.')
+            continue
         events.append(Event(
             event_type=event_type, event_time=action_time, action=action,
             player=player, car_id=car.car_id, position=car.position))
@@ -0,0 +1,151 @@
+import datetime
+import gzip
+import json
+import logging
+import os
+import time
+
+from dataclasses import dataclass
+from typing import Iterator
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from dzllogparser.models import Event, PlayerCarUsage
+from dzllogparser.services.stats import update_dataset_stats
+
+
+retention_logger = logging.getLogger(__name__)
+
+ARCHIVE_FILE_TEMPLATE = 'events-{month}.jsonl.gz'
+ARCHIVE_FIELDS = ('pk', 'action_time', 'player__steam_id', 'car__car_id',
+                  'action__name', 'position_x', 'position_y', 'position_z')
+
+
+@dataclass
+class RetentionStatus:
+    events_archived: int = 0
+    events_deleted: int = 0
+    partitions_dropped: int = 0
+    elapsed_time: float = 0
+
+
+@dataclass
+class EventPartition:
+    name: str
+    less_than: datetime.datetime
+
+
+def get_expired_partitions(
+        cutoff_time: datetime.datetime) -> list[EventPartition]:
+    """Returns Event table partitions containing only events older
+    than cutoff_time. Only MySQL tables partitioned
+    by RANGE COLUMNS(action_time) are supported, for other
+    databases and unpartitioned tables returns empty list.
+    Partitioning is set up manually, as InnoDB does not allow
+    foreign keys in partitioned tables.
+    """
+    if connection.vendor != 'mysql':
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT PARTITION_NAME, PARTITION_EXPRESSION, '
+            'PARTITION_DESCRIPTION FROM information_schema.PARTITIONS '
+            'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s '
+            "AND PARTITION_METHOD = 'RANGE COLUMNS' "
+            'ORDER BY PARTITION_ORDINAL_POSITION',
+            [Event._meta.db_table]
+        )
+        rows = cursor.fetchall()
+    partitions = []
+    for name, expression, description in rows:
+        if (expression.strip('`') != 'action_time'
+                or description == 'MAXVALUE'):
+            continue
+        less_than = datetime.datetime.fromisoformat(description.strip("'"))
+        less_than = timezone.make_aware(less_than, datetime.timezone.utc)
+        if less_than <= cutoff_time:
+            partitions.append(EventPartition(name=name, less_than=less_than))
+    return partitions
+
+
+def drop_partition(partition: EventPartition) -> None:
+    """Drops Event table partition with all its rows."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'ALTER TABLE {Event._meta.db_table} '
+            f'DROP PARTITION {connection.ops.quote_name(partition.name)}'
+        )
+
+
+def get_expired_event_chunks(cutoff_time: datetime.datetime,
+                             chunk_size: int) -> Iterator[list[dict]]:
+    """Yields chunks of events older than cutoff_time ordered by pk."""
+    last_pk = 0
+    while True:
+        chunk = list(
+            Event.objects.filter(action_time__lt=cutoff_time,
+                                 pk__gt=last_pk)
+            .order_by('pk').values(*ARCHIVE_FIELDS)[:chunk_size]
+        )
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1]['pk']
+
+
+def archive_events(events: list[dict], archive_dir: str) -> int:
+    """Appends events into monthly gzip compressed json lines files
+    and returns number of archived events.
+    """
+    monthly_events = dict()
+    for event in events:
+        month = event['action_time'].strftime('%Y-%m')
+        monthly_events.setdefault(month, []).append(event)
+    os.makedirs(archive_dir, exist_ok=True)
+    for month, month_events in monthly_events.items():
+        archive_path = os.path.join(
+            archive_dir, ARCHIVE_FILE_TEMPLATE.format(month=month))
+        with gzip.open(archive_path, 'at', encoding='utf-8') as archive:
+            for event in month_events:
+                archive.write(json.dumps(event, default=str,
+                                         ensure_ascii=False) + '\n')
+    return len(events)
+
+
+def prune_events(
+        days: int = settings.EVENT_RETENTION_DAYS,
+        chunk_size: int = settings.EVENT_RETENTION_CHUNK_SIZE,
+        archive_dir: str | None = settings.EVENT_ARCHIVE_DIR
+) -> RetentionStatus:
+    """Archives events older than days into archive_dir if it set,
+    and deletes them from Event table. Expired partitions are dropped
+    entirely, the rest is deleted in chunks of chunk_size rows.
+    """
+    start_time = time.perf_counter()
+    status = RetentionStatus()
+    cutoff_time = timezone.now() - timezone.timedelta(days=days)
+    for partition in get_expired_partitions(cutoff_time):
+        partition_events = 0
+        for events in get_expired_event_chunks(partition.less_than,
+                                               chunk_size):
+            if archive_dir:
+                status.events_archived += archive_events(events, archive_dir)
+            partition_events += len(events)
+        drop_partition(partition)
+        retention_logger.info(
+            f'Partition {partition.name} with {partition_events} '
+            f'events is dropped.')
+        status.events_deleted += partition_events
+        status.partitions_dropped += 1
+    for events in get_expired_event_chunks(cutoff_time, chunk_size):
+        if archive_dir:
+            status.events_archived += archive_events(events, archive_dir)
+        deleted, _ = Event.objects.filter(
+            pk__in=[event['pk'] for event in events]).delete()
+        status.events_deleted += deleted
+    PlayerCarUsage.objects.filter(day__lt=cutoff_time.date()).delete()
+    update_dataset_stats(events=-status.events_deleted)
+    status.elapsed_time = round(time.perf_counter() - start_time, 3)
+    return status
@@ -0,0 +1,76 @@
+from typing import NamedTuple
+
+from django.db.models import Count
+
+from dzllogparser.models import AliasTrigram, Player, PlayerAlias
+
+
+NICKNAME_SEARCH_LIMIT = 50
+NICKNAME_CANDIDATES_LIMIT = 2000
+
+
+class NicknameMatch(NamedTuple):
+    player: Player
+    name: str
+
+
+def normalize_name(name: str) -> str:
+    """Returns nickname in form used for search."""
+    return name.strip().casefold()
+
+
+def get_trigrams(normalized_name: str) -> set[str]:
+    """Returns set of all three characters substrings of name."""
+    return {
+        normalized_name[index:index + 3]
+        for index in range(len(normalized_name) - 2)
+    }
+
+
+def get_alias_candidates(query: str) -> list[PlayerAlias]:
+    """Returns aliases containing all query trigrams,
+    or aliases starting with query shorter than three characters.
+    """
+    trigrams = get_trigrams(query)
+    if trigrams:
+        aliases = PlayerAlias.objects.filter(
+            pk__in=AliasTrigram.objects.filter(trigram__in=trigrams)
+            .values('alias').annotate(matches=Count('pk'))
+            .filter(matches=len(trigrams)).values('alias')
+        )
+    else:
+        aliases = PlayerAlias.objects.filter(normalized_name__startswith=query)
+    return list(aliases.select_related('player').order_by(
+        '-last_seen_time')[:NICKNAME_CANDIDATES_LIMIT])
+
+
+def get_match_rank(query: str, alias: PlayerAlias) -> tuple:
+    """Returns sort key, exact matches go first, then prefix matches,
+    then the closest by length and the most recently seen names.
+    """
+    last_seen = alias.last_seen_time.timestamp() \
+        if alias.last_seen_time else 0
+    return (alias.normalized_name != query,
+            not alias.normalized_name.startswith(query),
+            len(alias.normalized_name) - len(query),
+            -last_seen)
+
+
+def search_players_by_nickname(nickname: str) -> list[NicknameMatch]:
+    """Returns players having current or alternate nickname
+    containing nickname, ordered by relevance.
+    """
+    query = normalize_name(nickname)
+    if not query:
+        return []
+    aliases = [
+        alias for alias in get_alias_candidates(query)
+        if query in alias.normalized_name
+    ]
+    aliases.sort(key=lambda alias: get_match_rank(query, alias))
+    matches = dict()
+    for alias in aliases:
+        if alias.player_id not in matches:
+            matches[alias.player_id] = NicknameMatch(player=alias.player,
+                                                     name=alias.name)
+    return list(matches.values())[:NICKNAME_SEARCH_LIMIT]
@@ -0,0 +1,76 @@
+import logging
+
+from django.conf import settings
+from django.db.models import F, Max
+from django.utils import timezone
+
+from dzllogparser.models import Car, DatasetStats, Event, Player
+
+
+stats_logger = logging.getLogger(__name__)
+
+DATASET_STATS_PK = 1
+
+
+def get_last_action_time():
+    """Returns newest event action time, read from action time index."""
+    return Event.objects.aggregate(Max('action_time'))['action_time__max']
+
+
+def reconcile_dataset_stats() -> DatasetStats:
+    """Recounts players, cars and events and saves exact numbers."""
+    stats, _ = DatasetStats.objects.update_or_create(
+        pk=DATASET_STATS_PK,
+        defaults={
+            'players_count': Player.objects.count(),
+            'cars_count': Car.objects.count(),
+            'events_count': Event.objects.count(),
+            'last_action_time': get_last_action_time(),
+            'reconciled_time': timezone.now(),
+        }
+    )
+    stats_logger.info(f'Dataset stats reconciled: {stats}.')
+    return stats
+
+
+def get_dataset_stats() -> DatasetStats:
+    """Returns dataset stats, counts them if they are not saved yet."""
+    stats = DatasetStats.objects.filter(pk=DATASET_STATS_PK).first()
+    if stats is None:
+        stats = reconcile_dataset_stats()
+    return stats
+
+
+def update_dataset_stats(players: int = 0, cars: int = 0,
+                         events: int = 0) -> None:
+    """Adds created minus deleted records numbers to dataset stats
+    and increments dataset version, so cached data becomes outdated.
+    """
+    DatasetStats.objects.filter(pk=DATASET_STATS_PK).update(
+        players_count=F('players_count') + players,
+        cars_count=F('cars_count') + cars,
+        events_count=F('events_count') + events,
+        last_action_time=get_last_action_time(),
+        version=F('version') + 1,
+    )
+
+
+def update_dataset_stats_by_deleted(deleted_by_model: dict[str, int]) -> None:
+    """Subtracts records numbers returned by QuerySet.delete()."""
+    update_dataset_stats(
+        players=-deleted_by_model.get(Player._meta.label, 0),
+        cars=-deleted_by_model.get(Car._meta.label, 0),
+        events=-deleted_by_model.get(Event._meta.label, 0),
+    )
+
+
+def reconcile_dataset_stats_if_expired() -> None:
+    """Reconciles dataset stats if they were last reconciled
+    more than STATS_RECONCILE_HOURS ago.
+    """
+    stats = get_dataset_stats()
+    expiration_time = timezone.now() - timezone.timedelta(
+        hours=settings.STATS_RECONCILE_HOURS)
+    if (stats.reconciled_time is None
+            or stats.reconciled_time < expiration_time):
+        reconcile_dataset_stats()
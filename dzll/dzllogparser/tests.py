@@ -1,3 +1,259 @@
+import copy
+import datetime
+
+from typing import Callable, Iterable
+from unittest import mock
+
+from django.db import connection
+from django.db.models import Sum
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from dzllogparser.forms import DateRangeForm
+from dzllogparser.models import (Car, Event, IngestCheckpoint, Player,
+                                 PlayerCarUsage)
+from dzllogparser.services.db import (import_cars_into_db,
+                                      import_events_into_db,
+                                      import_players_into_db,
+                                      remove_stored_events)
+from dzllogparser.services.ftp import LOGFILE_LINE_SEPARATOR
+from dzllogparser.services.logsource import LogSource, replay_logs
+from dzllogparser.services.parser import (ACTION_TIMEZONE, EventType,
+                                          defenition_logfile_data)
+from dzllogparser.services.stats import get_last_action_time
+from dzllogparser.views import EVENTS_PER_PAGE, VehicleTheftCasesView
+
+
+LOGFILE_DIR_NAME = '1681603200'
+LOGFILE_STRINGS = [
+    '10:00:00 | car:<name=(Sedan 2) type=OffroadHatchback_1 id=1016 '
+    'pos=2187.116212 5199.190366 7907.202752 status=[FREE]> initialized.',
+    '10:05:30 | Player{name:John Doe steam:76561190000000176 '
+    'pos:475.881168 7628.813651 4080.680499} открыл дверь '
+    'car:<name=(Sedan 2) type=OffroadHatchback_1 id=1016 '
+    'pos=2190.500000 5199.250000 7907.000000 status=[LINKED]>',
+    'garbage line',
+    '11:00:01 | car:<name=(Sedan 2) type=OffroadHatchback_1 id=1016 '
+    'pos=2200.000123 5200.000456 7910.000789 status=[LINKED]> DELETED.',
+]
+
+
+def get_player_action_string(number: int) -> str:
+    """Returns action string of one of 10 players with one of 5 cars."""
+    return (
+        f'10:{number // 60:02d}:{number % 60:02d} | '
+        f'Player{{name:Player {number % 10} steam:7656119{number % 10:010d} '
+        f'pos:1.000000 2.000000 3.000000}} открыл дверь '
+        f'car:<name=(Sedan) type=OffroadHatchback id={number % 5} '
+        f'pos=1.000000 2.000000 3.000000 status=[LINKED]>'
+    )
+
+
+def get_action_time(hours: int, minutes: int,
+                    seconds: int) -> datetime.datetime:
+    return datetime.datetime(2023, 4, 16, hours, minutes, seconds,
+                             tzinfo=ACTION_TIMEZONE)
+
+
+class ParserTest(TestCase):
+    """Parsed data is the same as of the former per-field regex parser."""
+
+    def setUp(self):
+        self.logfile_data = defenition_logfile_data(LOGFILE_DIR_NAME,
+                                                    LOGFILE_STRINGS)
+
+    def test_players(self):
+        player, = self.logfile_data.players.values()
+        self.assertEqual(player.steam_id, '76561190000000176')
+        self.assertEqual(player.name, 'John Doe')
+        self.assertEqual(player.alter_names, set())
+
+    def test_cars(self):
+        car = self.logfile_data.cars['1016']
+        self.assertEqual(len(self.logfile_data.cars), 1)
+        self.assertEqual(car.name, 'Sedan 2')
+        self.assertEqual(car.car_type, 'OffroadHatchback_1')
+        self.assertEqual(car.position, '2200.000, 5200.000, 7910.000')
+        self.assertEqual(car.status, 'DELETED')
+        self.assertEqual(car.last_init_time, get_action_time(10, 0, 0))
+        self.assertEqual(car.deletion_time, get_action_time(11, 0, 1))
+        self.assertIsNone(car.last_use_time)
+
+    def test_events(self):
+        action_event, delete_event = self.logfile_data.events
+        self.assertEqual(action_event.event_type, EventType.ACTION)
+        self.assertEqual(action_event.event_time, get_action_time(10, 5, 30))
+        self.assertEqual(action_event.action, 'открыл дверь')
+        self.assertEqual(action_event.player.steam_id, '76561190000000176')
+        self.assertEqual(action_event.car_id, '1016')
+        self.assertEqual(action_event.position, '2190.500, 5199.250, 7907.000')
+        self.assertEqual(delete_event.event_type, EventType.DELETE)
+        self.assertEqual(delete_event.event_time, get_action_time(11, 0, 1))
+        self.assertEqual(delete_event.action, 'DELETED.')
+        self.assertIsNone(delete_event.player)
+        self.assertEqual(delete_event.position, '2200.000, 5200.000, 7910.000')
+
+
+class ImportEventsQueriesTest(TestCase):
+    """Events foreign keys are resolved with bulk queries per import,
+    not with queries per event.
+    """
+
+    def get_import_events_queries(self, events_number: int,
+                                  dir_name: str = LOGFILE_DIR_NAME
+                                  ) -> list[str]:
+        logfile_data = defenition_logfile_data(
+            dir_name,
+            [get_player_action_string(number)
+             for number in range(events_number)]
+        )
+        import_players_into_db(logfile_data.players)
+        import_cars_into_db(logfile_data.cars)
+        with CaptureQueriesContext(connection) as context:
+            events_created = import_events_into_db(logfile_data.events)
+        self.assertEqual(events_created, events_number)
+        return [query['sql'] for query in context.captured_queries]
+
+    def test_queries_number_does_not_depend_on_events_number(self):
+        few_events_queries = self.get_import_events_queries(10)
+        many_events_queries = self.get_import_events_queries(
+            100, dir_name='1681689600')
+        self.assertEqual(len(few_events_queries), len(many_events_queries))
+
+    def test_players_and_cars_are_not_queried_per_event(self):
+        queries = self.get_import_events_queries(100)
+        self.assertEqual(
+            len([query for query in queries
+                 if 'FROM "dzllogparser_player"' in query]), 1)
+        self.assertEqual(
+            len([query for query in queries
+                 if 'FROM "dzllogparser_car"' in query]), 1)
+
+
+class EventIndexesTest(TestCase):
+    """Player and car history, theft and latest event queries
+    use Event indexes.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        theft_action, _ = VehicleTheftCasesView.events_type
+        logfile_data = defenition_logfile_data(
+            LOGFILE_DIR_NAME,
+            [get_player_action_string(number) if number % 10 else
+             get_player_action_string(number).replace('открыл дверь',
+                                                      theft_action)
+             for number in range(300)]
+        )
+        import_players_into_db(logfile_data.players)
+        import_cars_into_db(logfile_data.cars)
+        import_events_into_db(logfile_data.events)
+
+    def get_query_plan(self, function: Callable) -> str:
+        """Returns query plans of queries made by function."""
+        with CaptureQueriesContext(connection) as context:
+            function()
+        plans = []
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                cursor.execute(f'{connection.ops.explain_query_prefix()} '
+                               f'{query["sql"]}')
+                plans.extend(str(row) for row in cursor.fetchall())
+        return '\n'.join(plans)
+
+    def assert_index_used(self, index_name: str, function: Callable) -> None:
+        self.assertIn(index_name, self.get_query_plan(function))
+
+    def test_player_history_query(self):
+        player = Player.objects.first()
+        self.assert_index_used('event_player_time_idx', lambda: list(
+            Event.objects.filter(player=player)
+            .order_by('-action_time', '-pk')[:EVENTS_PER_PAGE]))
+
+    def test_car_history_query(self):
+        car = Car.objects.first()
+        self.assert_index_used('event_car_time_idx', lambda: list(
+            Event.objects.filter(car=car)
+            .order_by('-action_time', '-pk')[:EVENTS_PER_PAGE]))
+
+    def test_theft_query(self):
+        date_form = DateRangeForm({'date_from': '2023-04-16'})
+        self.assert_index_used('event_action_time_idx', lambda: list(
+            VehicleTheftCasesView().get_queryset(date_form)))
+
+    def test_latest_event_query(self):
+        self.assert_index_used('event_time_idx', get_last_action_time)
+
+
+class ImportEventsConflictTest(TestCase):
+    """Events stored by concurrent import after the hash lookup
+    are skipped and not counted as created.
+    """
+
+    def test_concurrently_stored_events_are_not_counted(self):
+        logfile_data = defenition_logfile_data(
+            LOGFILE_DIR_NAME,
+            [get_player_action_string(number) for number in range(10)]
+        )
+        import_players_into_db(logfile_data.players)
+        import_cars_into_db(logfile_data.cars)
+
+        def remove_and_store_concurrently(new_events):
+            remove_stored_events(new_events)
+            Event.objects.bulk_create(
+                [copy.copy(event) for event in list(new_events.values())[:3]])
+
+        with mock.patch('dzllogparser.services.db.remove_stored_events',
+                        remove_and_store_concurrently):
+            events_created = import_events_into_db(logfile_data.events)
+        self.assertEqual(events_created, 7)
+        self.assertEqual(Event.objects.count(), 10)
+        self.assertEqual(
+            PlayerCarUsage.objects.aggregate(
+                events_count=Sum('events_count'))['events_count'], 7)
+
+
+class LinesLogSource(LogSource):
+    """Log source with logfile strings in memory,
+    the last directory is still written.
+    """
+
+    def __init__(self, logfiles: dict[str, list[str]]) -> None:
+        self.logfiles = logfiles
+
+    def get_directories(self) -> list[str]:
+        return list(self.logfiles)
+
+    def get_current_directory(self) -> str | None:
+        return list(self.logfiles)[-1]
+
+    def get_logfile_lines(self, dir_name: str) -> Iterable[str]:
+        return self.logfiles[dir_name]
+
+
+class ReplayCheckpointTest(TestCase):
+    """Logfile which is still written is checkpointed up to its last
+    finished line, so the next tail import reads the unfinished one.
+    """
+
+    def assert_replay_checkpoint(self, parse_workers: int) -> None:
+        file_strings = [get_player_action_string(number)
+                        for number in range(10)]
+        complete_strings = file_strings[:-1]
+        file_strings[-1] = file_strings[-1][:20]
+        replay_logs(LinesLogSource({LOGFILE_DIR_NAME: file_strings}),
+                    parse_workers=parse_workers)
+        checkpoint = IngestCheckpoint.objects.get(directory=LOGFILE_DIR_NAME)
+        self.assertEqual(checkpoint.status,
+                         IngestCheckpoint.CheckpointStatus.PARTIAL)
+        self.assertEqual(
+            checkpoint.byte_offset,
+            len(''.join(string + LOGFILE_LINE_SEPARATOR
+                        for string in complete_strings).encode('utf-8')))
+        self.assertEqual(Event.objects.count(), len(complete_strings))
+
+    def test_sequential_replay_checkpoint(self):
+        self.assert_replay_checkpoint(parse_workers=1)
 
-# Create your tests here.
+    def test_parallel_replay_checkpoint(self):
+        self.assert_replay_checkpoint(parse_workers=2)
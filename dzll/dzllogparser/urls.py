@@ -3,9 +3,9 @@ from django.urls import path, include
 
 from dzllogparser.views import (
     IndexView, LoginUserView, PlayerView, CarView, SearchPlayerBySteamIDView,
-    SearchCarByIDView, SearchByNickname, UpdateDbView, logout_user,
-    VehicleTheftCasesView, VehicleLongUnusedView, CarDeleteView,
-    TransportOwnersView)
+    SearchCarByIDView, SearchByNickname, UpdateDbView, UpdateDbStatusView,
+    logout_user, VehicleTheftCasesView, VehicleLongUnusedView, CarDeleteView,
+    TransportOwnersView, CarOwnersRankingView)
 
 
 urlpatterns = [
@@ -28,6 +28,10 @@ urlpatterns = [
     path('delete_car/<int:pk>/', CarDeleteView.as_view(),
         name='delete_car'),
     path('update/', UpdateDbView.as_view(), name='update_db'),
+    path('update/<int:pk>/', UpdateDbStatusView.as_view(),
+         name='update_db_status'),
     path('transport_owner_view/<str:steam_id>/', TransportOwnersView.as_view(),
          name='transport_owner_view'),
+    path('car_owners_ranking/', CarOwnersRankingView.as_view(),
+         name='car_owners_ranking'),
 ]
@@ -5,20 +5,29 @@ from django.contrib.auth import logout
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.views import LoginView
-from django.core.paginator import Paginator
-from django.db.models import Q
-from django.http import HttpRequest, HttpResponse
+from django.http import HttpRequest, HttpResponseRedirect
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.generic import (TemplateView, RedirectView, DetailView,
-                                  View, ListView)
+                                  View)
 from django.views.generic.edit import DeleteView
 from django.urls import reverse_lazy
 from django.utils import timezone
 
-from dzllogparser.services.ftp import get_updates_from_ftp
-from dzllogparser.services.db import get_player_cars
-from dzllogparser.models import Player, Car, Event
+from dzllogparser.services.cache import get_cached, get_params_key
+from dzllogparser.services.db import get_owners_ranking, get_player_cars
+from dzllogparser.services.export import EXPORT_FORMATS, get_export_response
+from dzllogparser.services.ingest import enqueue_ingest_job
+from dzllogparser.services.search import search_players_by_nickname
+from dzllogparser.services.stats import (get_dataset_stats,
+                                        update_dataset_stats_by_deleted)
+from dzllogparser.models import Action, Player, Car, Event, IngestJob
+from dzllogparser.forms import DateRangeForm
 from dzllogparser.mixins import TitleMixin
+from dzllogparser.pagination import get_keyset_page
+
+
+EVENTS_PER_PAGE = 15
+ITEMS_PER_PAGE = 50
 
 
 class LoginUserView(LoginView):
@@ -33,15 +42,12 @@ class IndexView(LoginRequiredMixin, TitleMixin, TemplateView):
     
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(*args, **kwargs)
-        try:
-            last_action_time = Event.objects.last().action_time
-        except AttributeError:
-            last_action_time = None
+        dataset_stats = get_dataset_stats()
         context.update({
-            'players_number': Player.objects.all().count(),
-            'cars_number': Car.objects.all().count(),
-            'events_number': Event.objects.all().count(),
-            'last_action_time': last_action_time,
+            'players_number': dataset_stats.players_count,
+            'cars_number': dataset_stats.cars_count,
+            'events_number': dataset_stats.events_count,
+            'last_action_time': dataset_stats.last_action_time,
         })
         return context
 
@@ -58,31 +64,16 @@ class PlayerView(LoginRequiredMixin, TitleMixin, DetailView):
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(*args, **kwargs)
         last_actions = Event.objects.filter(player=self.object).select_related(
-            'car', 'player').order_by('-action_time')
-        paginated_actions = Paginator(last_actions, 15)
-        page_number = int(self.request.GET.get('page', 1))
-        actions_list = paginated_actions.page(page_number)
-        if paginated_actions.num_pages > 40:
-            if page_number < 20:
-                page_range = range(1, 41)
-            else:
-                if page_number - 18 <= 0:
-                    start_range = 1
-                else:
-                    start_range = page_number - 18
-                if page_number + 20 > paginated_actions.num_pages:
-                    page_range = range(start_range,
-                                       paginated_actions.num_pages + 1)
-                else:
-                    page_range = range(start_range, page_number + 21)
-        else:
-            page_range = paginated_actions.page_range
-
+            'car', 'player', 'action')
+        actions_page = get_cached(
+            f'player_events:{self.object.pk}:'
+            f'{get_params_key(self.request.GET)}',
+            lambda: get_keyset_page(
+                last_actions, self.request.GET, EVENTS_PER_PAGE,
+                f'player_events_count:{self.object.pk}')
+        )
         context.update({
-            'last_actions': actions_list,
-            'current_page': int(page_number),
-            'paginated_range': page_range,
-            'num_pages': paginated_actions.num_pages,
+            'last_actions': actions_page,
             'car_owner_data': get_player_cars(self.object.steam_id),
         })
         return context
@@ -100,49 +91,38 @@ class CarView(LoginRequiredMixin, TitleMixin, DetailView):
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(*args, **kwargs)
         last_actions = Event.objects.filter(car=self.object).select_related(
-            'car', 'player').order_by('-action_time')
-
-        paginated_actions = Paginator(last_actions, 15)
-        page_number = int(self.request.GET.get('page', 1))
-        actions_list = paginated_actions.page(page_number)
-        if paginated_actions.num_pages > 40:
-            if page_number < 20:
-                page_range = range(1, 41)
-            else:
-                if page_number - 18 <= 0:
-                    start_range = 1
-                else:
-                    start_range = page_number - 18
-                if page_number + 20 > paginated_actions.num_pages:
-                    page_range = range(start_range,
-                                       paginated_actions.num_pages + 1)
-                else:
-                    page_range = range(start_range, page_number + 21)
-        else:
-            page_range = paginated_actions.page_range
-
+            'car', 'player', 'action')
+        actions_page = get_cached(
+            f'car_events:{self.object.pk}:'
+            f'{get_params_key(self.request.GET)}',
+            lambda: get_keyset_page(
+                last_actions, self.request.GET, EVENTS_PER_PAGE,
+                f'car_events_count:{self.object.pk}')
+        )
         context.update({
-            'last_actions': actions_list,
-            'current_page': int(page_number),
-            'paginated_range': page_range,
-            'num_pages': paginated_actions.num_pages
+            'last_actions': actions_page,
         })
         return context
 
 
-class UpdateDbView(View):
-    """Manual update db view"""
+class UpdateDbView(LoginRequiredMixin, View):
+    """Manual update db view, enqueues ingest job"""
     def get(self, request, *args, **kwargs):
-        records_status = get_updates_from_ftp()
-        return HttpResponse(
-            f'Player: created {records_status.players_created}, '
-            f'updated {records_status.players_updated}. '
-            f'Car created {records_status.car_created}, '
-            f'updated {records_status.car_updated}, '
-            f'deleted {records_status.car_deleted}. '
-            f'Events created: {records_status.events_created}. '
-            f'Eplased time: {records_status.elapsed_time}s.'
-        )
+        job = enqueue_ingest_job()
+        return redirect(job)
+
+
+class UpdateDbStatusView(LoginRequiredMixin, TitleMixin, DetailView):
+    template_name = 'dzllogparser/update_db_status.html'
+    model = IngestJob
+    title = 'Update status'
+
+    def get_context_data(self, *args, **kwargs):
+        context = super().get_context_data(*args, **kwargs)
+        context.update({
+            'refresh_interval': 5 if self.object.is_active() else None,
+        })
+        return context
 
 
 class SearchPlayerBySteamIDView(LoginRequiredMixin, RedirectView):
@@ -164,43 +144,93 @@ class SearchByNickname(LoginRequiredMixin, TitleMixin, TemplateView):
     title = 'Search by nickname'
 
     def post(self, request):
-        nickname = request.POST.get('nickname')
-        founded_players = Player.objects.filter(
-            Q(dayzname__icontains=nickname) | \
-                Q(dayz_alt_names__icontains=nickname))
+        nickname = request.POST.get('nickname', '')
         context = {
-            'players_with_nickname': founded_players,
+            'players_with_nickname': search_players_by_nickname(nickname),
             'title': self.title,
         }
         return super(TemplateView, self).render_to_response(context)
 
 
-class VehicleTheftCasesView(LoginRequiredMixin, TitleMixin, ListView):
+class VehicleTheftCasesView(LoginRequiredMixin, TitleMixin, TemplateView):
     template_name = 'dzllogparser/vehicle_thefts_view.html'
     title = 'Vehicle theft cases'
-    model = Event
     events_type = ('сломал замок', 'неудачная попытка взлома замка')
-    queryset = Event.objects.filter(
-            action__in=events_type).select_related('car', 'player').order_by(
-                '-action_time')
+    export_fields = ('action_time', 'player__steam_id', 'player__dayzname',
+                     'action__name', 'car__car_id', 'car__name',
+                     'position_x', 'position_y', 'position_z')
+
+    def get_queryset(self, date_form: DateRangeForm):
+        return Event.objects.filter(
+            action__in=Action.objects.filter(name__in=self.events_type),
+            **date_form.get_time_filters('action_time')
+        )
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get('export')
+        if export_format in EXPORT_FORMATS:
+            return get_export_response(
+                self.get_queryset(DateRangeForm(request.GET)),
+                self.export_fields, export_format, 'vehicle_thefts')
+        return super().get(request, *args, **kwargs)
+
+    def get_context_data(self, *args, **kwargs):
+        context = super().get_context_data(*args, **kwargs)
+        date_form = DateRangeForm(self.request.GET)
+        filter_query = date_form.get_query()
+        thefts_page = get_cached(
+            f'vehicle_thefts:{get_params_key(self.request.GET)}',
+            lambda: get_keyset_page(
+                self.get_queryset(date_form).select_related(
+                    'car', 'player', 'action'),
+                self.request.GET, ITEMS_PER_PAGE,
+                f'vehicle_thefts_count:{filter_query}')
+        )
+        context.update({
+            'page': thefts_page,
+            'date_form': date_form,
+            'filter_query': filter_query,
+        })
+        return context
 
 
-class VehicleLongUnusedView(LoginRequiredMixin, TitleMixin, ListView):
+class VehicleLongUnusedView(LoginRequiredMixin, TitleMixin, TemplateView):
     template_name = 'dzllogparser/unused_vehicle_view.html'
     title = 'Long unused vehicle list'
-    model = Car
+    export_fields = ('car_id', 'name', 'car_type', 'position', 'car_status',
+                     'last_using_time')
 
-    def get_queryset(self):
+    def get_queryset(self, date_form: DateRangeForm):
         criteria_time = timezone.now() - timezone.timedelta(
             days=settings.UNSING_DAYS_LIMIT)
-        unused_cars_queryset = Car.objects.filter(
-            last_using_time__lte=criteria_time).exclude(
-                car_status=Car.CarStatus.DELETED).order_by('last_using_time')
-        return unused_cars_queryset
-    
-    def get_context_data(self):
-        context = super().get_context_data()
+        return Car.objects.filter(
+            last_using_time__lte=criteria_time,
+            **date_form.get_time_filters('last_using_time')
+        ).exclude(car_status=Car.CarStatus.DELETED)
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get('export')
+        if export_format in EXPORT_FORMATS:
+            return get_export_response(
+                self.get_queryset(DateRangeForm(request.GET)),
+                self.export_fields, export_format, 'unused_vehicles')
+        return super().get(request, *args, **kwargs)
+
+    def get_context_data(self, *args, **kwargs):
+        context = super().get_context_data(*args, **kwargs)
+        date_form = DateRangeForm(self.request.GET)
+        filter_query = date_form.get_query()
+        cars_page = get_cached(
+            f'vehicle_long_unused:{get_params_key(self.request.GET)}',
+            lambda: get_keyset_page(
+                self.get_queryset(date_form), self.request.GET,
+                ITEMS_PER_PAGE, f'vehicle_long_unused_count:{filter_query}',
+                time_field='last_using_time', descending=False)
+        )
         context.update({
+            'page': cars_page,
+            'date_form': date_form,
+            'filter_query': filter_query,
             'unused_limit': settings.UNSING_DAYS_LIMIT,
         })
         return context
@@ -219,11 +249,30 @@ class TransportOwnersView(LoginRequiredMixin, TitleMixin, TemplateView):
         return context
 
 
+class CarOwnersRankingView(LoginRequiredMixin, TitleMixin, TemplateView):
+    title = 'Car owners ranking'
+    template_name = 'dzllogparser/owners_ranking.html'
+
+    def get_context_data(self, *args, **kwargs):
+        context = super().get_context_data(*args, **kwargs)
+        context.update({
+            'owners_ranking': get_owners_ranking(),
+            'used_days_limit': settings.MINIMAL_USED_DAYS_CRITERIA,
+        })
+        return context
+
+
 class CarDeleteView(DeleteView):
     model = Car
     success_url = "/"
     template_name = "dzllogparser/car_delete_confirm.html"
 
+    def form_valid(self, form):
+        success_url = self.get_success_url()
+        _, deleted_by_model = self.object.delete()
+        update_dataset_stats_by_deleted(deleted_by_model)
+        return HttpResponseRedirect(success_url)
+
 
 def logout_user(request):
     logout(request)